@@ -0,0 +1,67 @@
+# Sort Plan Benchmark
+# Replays randomized hands through the sort planner on the simulated arm and
+# reports the number of moves and the estimated arm time per hand
+
+import argparse
+import random
+import statistics
+
+from simulated_arm import SimulatedRobotArm
+from sort_cards import apply_move, move_card, plan_sort
+from cards import CARD_TUPLES
+
+
+def random_hand(rng, num_positions, empty_probability):
+    """Random hand of (rank, suit) cards from one deck, None for empty positions"""
+    cards = rng.sample(CARD_TUPLES, num_positions)
+    return [None if rng.random() < empty_probability else card for card in cards]
+
+
+def run_hand(robot, hand, sort_positions, temp_positions):
+    """Plan and execute one hand on the simulated arm, return (moves, seconds)"""
+    card_positions = dict(zip(sort_positions, hand))
+    for pos in temp_positions:
+        card_positions[pos] = None
+
+    moves = plan_sort(card_positions, sort_positions, temp_positions)
+    robot.reset_stats()
+    for move in moves:
+        move_card(robot, move['from'], move['to'])
+        apply_move(card_positions, move)
+    return len(moves), robot.stats()['elapsed']
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark sort plans on the simulated robot arm')
+    parser.add_argument('--hands', type=int, default=1000, help='Number of random hands')
+    parser.add_argument('--positions', type=int, default=4, help='Number of positions to sort')
+    parser.add_argument('--temps', type=int, default=1, help='Number of temp positions after them')
+    parser.add_argument('--empty', type=float, default=0.1, help='Probability that a position is empty')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    sort_positions = list(range(1, args.positions + 1))
+    temp_positions = list(range(args.positions + 1, args.positions + args.temps + 1))
+
+    # Extend the default arc of positions so any layout size can be simulated
+    total = args.positions + args.temps
+    positions = {'home': (0, 90, 60)}
+    for pos in sort_positions + temp_positions:
+        positions[f'pos_{pos}'] = (-40 + 80 * (pos - 1) / max(1, total - 1), 45, 60)
+    robot = SimulatedRobotArm(positions=positions)
+    robot.initialize()
+
+    rng = random.Random(args.seed)
+    move_counts = []
+    times = []
+    for _ in range(args.hands):
+        moves, seconds = run_hand(robot, random_hand(rng, args.positions, args.empty), sort_positions, temp_positions)
+        move_counts.append(moves)
+        times.append(seconds)
+    robot.close()
+
+    print(f"{args.hands} hands, {args.positions} positions, {args.temps} temp position(s)")
+    print(f"Moves per hand:    mean {statistics.mean(move_counts):.2f}  "
+          f"median {statistics.median(move_counts):.0f}  max {max(move_counts)}  total {sum(move_counts)}")
+    print(f"Arm time per hand: mean {statistics.mean(times):.2f} s  "
+          f"median {statistics.median(times):.2f} s  max {max(times):.2f} s  total {sum(times):.1f} s")
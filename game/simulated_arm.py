@@ -0,0 +1,128 @@
+# Simulated Robot Arm
+# Drop-in stand-in for robotics_arm.robot_arm_class.RobotArm that needs no
+# hardware. Instead of moving, it adds up how long each motion would take,
+# so sort plans can be timed and tested anywhere.
+
+import time
+
+# Joint angles (base, shoulder in degrees; z height in mm) of each named position.
+# Positions 1-5 sit on an arc in front of the arm, like the physical layout.
+DEFAULT_POSITIONS = {
+    'home': (0, 90, 60),
+    'pos_1': (-40, 45, 60),
+    'pos_2': (-20, 45, 60),
+    'pos_3': (0, 45, 60),
+    'pos_4': (20, 45, 60),
+    'pos_5': (40, 45, 60),
+}
+
+# Joint speeds (degrees/s for the rotary joints, mm/s for z)
+DEFAULT_JOINT_SPEEDS = (90.0, 90.0, 100.0)
+
+# Fixed cost of every motion (acceleration, settling), in seconds
+DEFAULT_MOTION_OVERHEAD = 0.15
+
+# Depth z travels down to reach a card, in mm
+DEFAULT_PICK_DEPTH = 50.0
+
+# Time to close or open the gripper / suction, in seconds
+DEFAULT_GRIP_TIME = 0.3
+
+
+class SimulatedRobotArm:
+    """Robot arm with the RobotArm interface used by sort_cards and a motion-time model
+
+    All joints move at the same time, so a motion takes as long as its
+    slowest joint (distance / speed) plus a fixed overhead. grab_at and
+    place_at go to a position, lower z by pick_depth, grip or release and
+    raise z again.
+    """
+
+    def __init__(self, positions=None, joint_speeds=DEFAULT_JOINT_SPEEDS,
+                 motion_overhead=DEFAULT_MOTION_OVERHEAD, pick_depth=DEFAULT_PICK_DEPTH,
+                 grip_time=DEFAULT_GRIP_TIME, realtime=False, verbose=False):
+        self.POSITIONS = dict(positions or DEFAULT_POSITIONS)
+        self.joint_speeds = joint_speeds
+        self.motion_overhead = motion_overhead
+        self.pick_depth = pick_depth
+        self.grip_time = grip_time
+        self.realtime = realtime  # also sleep for the modeled time
+        self.verbose = verbose
+
+        self.angles = self.POSITIONS['home']
+        self.holding = False
+        self.initialized = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the simulated clock and the motion counters"""
+        self.elapsed = 0.0
+        self.motions = 0
+        self.grabs = 0
+        self.places = 0
+
+    def _spend(self, seconds):
+        self.elapsed += seconds
+        if self.realtime:
+            time.sleep(seconds)
+
+    def initialize(self):
+        """Home the arm"""
+        self.initialized = True
+        self.holding = False
+        self.move_to_angle(*self.POSITIONS['home'])
+
+    def close(self):
+        """Release the (simulated) ports"""
+        self.initialized = False
+
+    def motion_time(self, start, end):
+        """Modeled time to move the joints from start to end angles"""
+        return max(abs(b - a) / speed for a, b, speed in zip(start, end, self.joint_speeds)) + self.motion_overhead
+
+    def move_to_angle(self, *angles, should_grip=False):
+        """Move all joints to the given angles"""
+        if len(angles) != len(self.joint_speeds):
+            raise ValueError(f"Expected {len(self.joint_speeds)} joint angles, got {len(angles)}")
+        if should_grip != self.holding:
+            raise RuntimeError(f"Moving with should_grip={should_grip} while holding={self.holding}")
+        self._spend(self.motion_time(self.angles, angles))
+        self.angles = tuple(angles)
+        self.motions += 1
+
+    def _pick(self, pos):
+        angles = self.POSITIONS[f'pos_{pos}']
+        self.move_to_angle(*angles, should_grip=self.holding)
+        lowered = angles[:-1] + (angles[-1] - self.pick_depth,)
+        # Lower, grip or release, raise again
+        self._spend(2 * self.motion_time(angles, lowered) + self.grip_time)
+        self.motions += 2
+
+    def grab_at(self, pos):
+        """Pick up the card at a position"""
+        if self.holding:
+            raise RuntimeError(f"grab_at({pos}) while already holding a card")
+        self._pick(pos)
+        self.holding = True
+        self.grabs += 1
+        if self.verbose:
+            print(f"[sim {self.elapsed:7.2f}s] grab_at({pos})")
+
+    def place_at(self, pos):
+        """Put the held card down at a position"""
+        if not self.holding:
+            raise RuntimeError(f"place_at({pos}) without holding a card")
+        self._pick(pos)
+        self.holding = False
+        self.places += 1
+        if self.verbose:
+            print(f"[sim {self.elapsed:7.2f}s] place_at({pos})")
+
+    def stats(self):
+        """Return the simulated time and motion counters"""
+        return {
+            'elapsed': self.elapsed,
+            'motions': self.motions,
+            'grabs': self.grabs,
+            'places': self.places,
+        }
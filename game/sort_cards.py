@@ -1,24 +1,54 @@
 # Sort Cards Game
 # Places cards in order of rank (smallest to largest) at positions 1-4
-# Uses position 5 as a temporary holder for swapping
+# Uses position 5 as a temporary holder for cycles of misplaced cards
 
 import sys
 import os
 import json
+import ssl
 import time
+import urllib.error
+import urllib.parse
+import urllib.request
 
 # Add parent directory to path so we can import robotics_arm
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(SCRIPT_DIR)
 sys.path.append(ROOT_DIR)
-from robotics_arm.robot_arm_class import RobotArm
 
-# Path to the hand file written by the card reader server
-HAND_FILE = os.path.join(ROOT_DIR, 'yolo_card_reader', 'latest_hand.json')
+# Shared card encoding, next to the card detector
+sys.path.append(os.path.join(ROOT_DIR, 'yolo_card_reader', 'yolo11-poker-hand-detection-and-analysis-main'))
+from cards import CARD_NAMES, Hand, parse_card, rank_label
+
+# Table whose hand is sorted, when the card reader serves several (default: its default table)
+TABLE = os.environ.get('CARD_READER_TABLE')
+
+# Path to the hand file written by the card reader server for that table
+HAND_FILE = os.path.join(ROOT_DIR, 'yolo_card_reader', f'latest_hand_{TABLE}.json' if TABLE else 'latest_hand.json')
+
+# Card reader server, asked to report hand changes instead of re-reading the file
+HAND_URL = os.environ.get('CARD_READER_URL', 'https://localhost:5000') + (f'/tables/{TABLE}/hand' if TABLE else '/hand')
+
+# Positions that get sorted, and empty positions usable as temporary holders
+SORT_POSITIONS = [1, 2, 3, 4]
+TEMP_POSITIONS = [5]
+
+
+def create_robot(simulated=False):
+    """Connect to the robot arm, or create a simulated one.
+
+    The hardware driver is only imported for the real arm, so planning and
+    the simulator work on machines without it.
+    """
+    if simulated:
+        from simulated_arm import SimulatedRobotArm
+        return SimulatedRobotArm(verbose=True)
+    from robotics_arm.robot_arm_class import RobotArm
+    return RobotArm(port_xy="COM5", port_z="COM10")
 
 
 def get_hand():
-    """Read latest detected cards from file."""
+    """Read latest detected cards from file (the server replaces it atomically)."""
     try:
         with open(HAND_FILE, 'r') as f:
             data = json.load(f)
@@ -31,6 +61,29 @@ def get_hand():
         return []
 
 
+def wait_for_hand(since=0, timeout=25):
+    """Wait until the card reader has a hand newer than version `since`.
+
+    Returns (version, hand). If nothing changes within timeout seconds the
+    current hand is returned. If the server cannot be reached, falls back to
+    the hand file with version None.
+    """
+    query = urllib.parse.urlencode({'since': since, 'timeout': timeout})
+    context = None
+    if HAND_URL.startswith('https'):
+        # The card reader serves a self-signed certificate
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    try:
+        with urllib.request.urlopen(f"{HAND_URL}?{query}", timeout=timeout + 5, context=context) as response:
+            data = json.load(response)
+        return data.get('version'), data.get('hand', [])
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        print(f"Warning: Could not reach {HAND_URL} ({e}), reading {HAND_FILE}")
+        return None, get_hand()
+
+
 def move_card(robot, from_pos, to_pos):
     """Move card from one position to another."""
     robot.grab_at(from_pos)
@@ -38,119 +91,166 @@ def move_card(robot, from_pos, to_pos):
     robot.place_at(to_pos)
 
 
-def swap_cards(robot, pos_a, pos_b, temp_pos=5):
-    """Swap cards at two positions using temp holder."""
-    move_card(robot, pos_a, temp_pos)  # A -> temp
-    move_card(robot, pos_b, pos_a)      # B -> A
-    move_card(robot, temp_pos, pos_b)   # temp -> B
+def plan_sort(card_positions, sort_positions=SORT_POSITIONS, temp_positions=TEMP_POSITIONS):
+    """Plan the fewest moves that sort the cards at sort_positions by rank.
+
+    Cards end up smallest first at the first sort positions, empty positions
+    last (cards of equal rank in any order). Every position holding the wrong
+    rank is an edge "current rank -> target rank" (empty counts as a rank).
+    Each connected group of edges is walked as one cycle, each misplaced card
+    moving once straight to its final position. A group containing an empty
+    position starts by filling it and needs no extra move; any other group
+    parks one card in an empty temp position first, which costs one extra
+    move. Every misplaced card has to move at least once, and a group without
+    an empty position cannot start without a free spot, so no plan is shorter.
+    With several temp positions, each cycle uses the one nearest to it.
+
+    Args:
+        card_positions: Dict position -> card tuple (rank, suit) or None.
+        sort_positions: Positions to sort, in target order.
+        temp_positions: Positions that may hold a card temporarily (must be empty).
+
+    Returns:
+        List of moves {'from', 'to', 'card'}, to be executed in order.
+    """
+    cards = [card_positions[pos] for pos in sort_positions if card_positions.get(pos) is not None]
+    target_ranks = sorted(card[0] for card in cards) + [None] * (len(sort_positions) - len(cards))
+    target_of = dict(zip(sort_positions, target_ranks))
+
+    def rank_at(pos):
+        card = card_positions.get(pos)
+        return None if card is None else card[0]
+
+    # Positions leaving each rank (None = empty) in the current -> target rank graph
+    edges = {}
+    for pos in sort_positions:
+        if rank_at(pos) != target_of[pos]:
+            edges.setdefault(rank_at(pos), []).append(pos)
+
+    def circuit_from(node):
+        # Hierholzer: positions in an order where each one's target rank is the next one's current rank
+        stack = [(node, None)]
+        circuit = []
+        while stack:
+            node, pos = stack[-1]
+            if edges.get(node):
+                next_pos = edges[node].pop()
+                stack.append((target_of[next_pos], next_pos))
+            else:
+                stack.pop()
+                if pos is not None:
+                    circuit.append(pos)
+        return circuit[::-1]
+
+    position_moves = []
+    if None in edges:
+        # Starts at an empty position: fill each position from the next one in the circuit
+        circuit = circuit_from(None)
+        for pos, source in zip(circuit, circuit[1:]):
+            if rank_at(source) is not None:
+                position_moves.append((source, pos))
+
+    free = [pos for pos in temp_positions if card_positions.get(pos) is None]
+    while any(edges.values()):
+        circuit = circuit_from(next(node for node, positions in edges.items() if positions))
+        if not free:
+            raise ValueError("No empty temp position to break a cycle of misplaced cards")
+        # Rotate the cycle so it starts next to the nearest temp position
+        start, temp = min(((i, slot) for i in range(len(circuit)) for slot in free),
+                          key=lambda choice: abs(choice[1] - circuit[choice[0]]))
+        circuit = circuit[start:] + circuit[:start]
+        position_moves.append((circuit[0], temp))
+        position_moves.extend(zip(circuit[1:], circuit))
+        position_moves.append((temp, circuit[-1]))
+
+    # Attach the moving card to each move
+    positions = dict(card_positions)
+    moves = []
+    for from_pos, to_pos in position_moves:
+        move = {'from': from_pos, 'to': to_pos, 'card': positions[from_pos]}
+        apply_move(positions, move)
+        moves.append(move)
+    return moves
+
+
+def apply_move(card_positions, move):
+    """Apply a planned move to a position -> card dict."""
+    card_positions[move['to']] = card_positions[move['from']]
+    card_positions[move['from']] = None
+
+
+def execute_moves(robot, moves, card_positions, pause=0.5):
+    """Carry out planned moves with the robot, tracking card positions in memory."""
+    for move in moves:
+        print(f"Moving {card_to_string(move['card'])}: position {move['from']} -> {move['to']}")
+        move_card(robot, move['from'], move['to'])
+        apply_move(card_positions, move)
+
+        time.sleep(pause)
 
 
 def rank_to_string(rank):
     """Convert rank number to readable string."""
-    names = {11: 'J', 12: 'Q', 13: 'K', 14: 'A'}
-    return names.get(rank, str(rank))
+    return rank_label(rank)
 
 
 def card_to_string(card):
     """Convert card tuple to readable string."""
     if card is None:
         return "Empty"
-    rank, suit = card
-    return f"{rank_to_string(rank)}{suit}"
+    return CARD_NAMES[parse_card(card)]
 
 
 def print_positions(card_positions):
     """Print current card positions."""
-    for pos in range(1, 5):
+    for pos in SORT_POSITIONS:
         card = card_positions.get(pos)
         print(f"  Position {pos}: {card_to_string(card)}")
 
 
-def main():
+def main(simulated=False):
     print("=== Card Sorting Game ===")
-    print("Cards at positions 1-4 will be sorted smallest to largest")
-    print("Position 5 is used as temp holder")
+    print(f"Cards at positions {SORT_POSITIONS[0]}-{SORT_POSITIONS[-1]} will be sorted smallest to largest")
+    print(f"Position(s) {', '.join(map(str, TEMP_POSITIONS))} used as temp holder")
     print()
 
     # Initialize robot
-    robot = RobotArm(port_xy="COM5", port_z="COM10")
+    robot = create_robot(simulated)
     robot.initialize()
 
     try:
-        # Read cards ONCE from file
+        # Read cards ONCE (waits for the first detected hand if there is none yet)
         print("Reading cards...")
-        hand = get_hand()
+        _, hand = wait_for_hand(since=0)
 
-        if len(hand) < 4:
-            print(f"Error: Need at least 4 card positions, got {len(hand)}")
+        if len(hand) < len(SORT_POSITIONS):
+            print(f"Error: Need at least {len(SORT_POSITIONS)} card positions, got {len(hand)}")
             return
 
         # Store cards in memory: position -> card
         # We'll track all moves internally from now on
-        card_positions = {}
-        for i in range(4):
-            card_positions[i + 1] = hand[i]  # positions 1-4
-        card_positions[5] = None  # temp holder starts empty
+        # (rank, suit) pairs from the server are parsed into a compact Hand,
+        # whose slots become the shared card tuples
+        card_positions = dict(zip(SORT_POSITIONS, Hand(hand[:len(SORT_POSITIONS)]).tuples()))
+        for pos in TEMP_POSITIONS:
+            card_positions[pos] = None  # temp holders start empty
 
         # Show current hand
         print("Current cards:")
         print_positions(card_positions)
 
-        # Get non-empty cards with their positions
-        cards = []
-        for pos in range(1, 5):
-            card = card_positions[pos]
-            if card is not None:
-                cards.append((card[0], pos))  # (rank, position)
-
-        if len(cards) < 2:
+        ranks = sorted(card[0] for card in card_positions.values() if card is not None)
+        if len(ranks) < 2:
             print("Need at least 2 cards to sort!")
             return
 
-        # Sort by rank (smallest first)
-        sorted_by_rank = sorted(cards, key=lambda x: x[0])
-
         print()
         print("Target order (smallest to largest):")
-        for i, (rank, _) in enumerate(sorted_by_rank):
-            print(f"  Position {i+1}: {rank_to_string(rank)}")
-
-        # Helper to swap in memory
-        def memory_swap(positions, pos_a, pos_b, temp_pos=5):
-            positions[temp_pos] = positions[pos_a]
-            positions[pos_a] = positions[pos_b]
-            positions[pos_b] = positions[temp_pos]
-            positions[temp_pos] = None
+        for pos, rank in zip(SORT_POSITIONS, ranks):
+            print(f"  Position {pos}: {rank_to_string(rank)}")
 
         # Calculate all moves first (dry run)
-        planned_moves = []
-        sim_positions = card_positions.copy()  # simulate positions
-
-        for target_idx in range(len(sorted_by_rank)):
-            target_pos = target_idx + 1
-            target_rank = sorted_by_rank[target_idx][0]
-
-            # Find where the target card currently is
-            current_pos = None
-            for pos in range(1, 5):
-                card = sim_positions[pos]
-                if card is not None and card[0] == target_rank:
-                    current_pos = pos
-                    break
-
-            if current_pos is None or current_pos == target_pos:
-                continue
-
-            # Record the swap
-            card_a = sim_positions[current_pos]
-            card_b = sim_positions[target_pos]
-            planned_moves.append({
-                'from': current_pos,
-                'to': target_pos,
-                'card_moving': card_a,
-                'card_displaced': card_b
-            })
-            memory_swap(sim_positions, current_pos, target_pos)
+        planned_moves = plan_sort(card_positions)
 
         # Show planned moves
         print()
@@ -161,48 +261,21 @@ def main():
             print("  Cards already sorted! No moves needed.")
         else:
             for i, move in enumerate(planned_moves, 1):
-                card_a = card_to_string(move['card_moving'])
-                card_b = card_to_string(move['card_displaced'])
-                print(f"  {i}. Swap position {move['from']} <-> {move['to']}")
-                print(f"     ({card_a} <-> {card_b})")
-                print(f"     Actions: grab_at({move['from']}) -> place_at(5)")
-                print(f"              grab_at({move['to']}) -> place_at({move['from']})")
-                print(f"              grab_at(5) -> place_at({move['to']})")
-                print()
+                print(f"  {i}. Move {card_to_string(move['card'])} from position {move['from']} to {move['to']}")
+                print(f"     Actions: grab_at({move['from']}) -> place_at({move['to']})")
+            print()
+            print(f"  {len(planned_moves)} moves")
 
         print("=" * 40)
         input("Press Enter to start sorting...")
 
         # Now execute the actual moves
-        for target_idx in range(len(sorted_by_rank)):
-            target_pos = target_idx + 1
-            target_rank = sorted_by_rank[target_idx][0]
-
-            # Find where the target card currently is (from memory)
-            current_pos = None
-            for pos in range(1, 5):
-                card = card_positions[pos]
-                if card is not None and card[0] == target_rank:
-                    current_pos = pos
-                    break
-
-            if current_pos is None:
-                print(f"Warning: Could not find card with rank {target_rank}")
-                continue
-
-            if current_pos == target_pos:
-                print(f"Card {rank_to_string(target_rank)} already at position {target_pos}")
-                continue
-
-            # Swap cards
-            print(f"Swapping position {current_pos} <-> {target_pos}")
-            swap_cards(robot, current_pos, target_pos)
-            memory_swap(card_positions, current_pos, target_pos)
-
-            time.sleep(0.5)
+        execute_moves(robot, planned_moves, card_positions, pause=0 if simulated else 0.5)
 
         print()
         print("Sorting complete!")
+        if simulated:
+            print(f"Estimated arm time: {robot.stats()['elapsed']:.1f} s")
 
         # Show final result (from memory)
         print("Final cards:")
@@ -213,4 +286,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sort the detected cards with the robot arm')
+    parser.add_argument('--sim', action='store_true', help='Use the simulated arm instead of the hardware')
+    args = parser.parse_args()
+
+    main(simulated=args.sim)
@@ -1,55 +1,128 @@
-from flask import Flask, render_template, request, jsonify
-import cv2
+from flask import Flask, Response, abort, render_template, request, jsonify
+from flask_sock import Sock
 import json
 import os
+import re
 import sys
-import numpy as np
+import time
 from threading import Lock
 
 # Import detect_cards from the YOLO repo
 sys.path.append('yolo11-poker-hand-detection-and-analysis-main')
-from detect_cards import detect_cards
+from cards import Hand
+from detect_cards import (BACKENDS, detect_card_boxes, detect_card_boxes_batch, export_weights,
+                          get_model, model_stats)
+from inference_worker import LatestFrameWorker
+from zone_cache import ZoneChangeDetector
+from zone_results import card_box, zone_result
+from hand_tracker import HandTracker
+from hand_store import HandStore
+from metrics import LatencyMetrics, stage_timer
+from frame_decode import decode_frame
+from batch_scheduler import BatchScheduler
 
 app = Flask(__name__)
-
-# Card string to tuple conversion
-RANK_MAP = {
-    '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8,
-    '9': 9, '10': 10, 'J': 11, 'Q': 12, 'K': 13, 'A': 14
-}
-
-def card_string_to_tuple(card_str):
-    """Convert YOLO card string (e.g., 'AH', '10D') to tuple (rank, suit)."""
-    # Handle 10 specially since it's two characters
-    if card_str.startswith('10'):
-        rank_str = '10'
-        suit = card_str[2]
-    else:
-        rank_str = card_str[0]
-        suit = card_str[1]
-
-    rank = RANK_MAP.get(rank_str)
-    if rank is None:
-        return None
-    return (rank, suit)
+sock = Sock(app)
 
 # Global variables
 config = {}
 config_lock = Lock()
-card_results = []
-latest_hand = None  # Store latest detected hand for /hand endpoint
 
 # Model path (hardcoded)
 MODEL_PATH = 'yolo11-poker-hand-detection-and-analysis-main/weights/poker_best.pt'
 
+# Weights actually loaded: MODEL_PATH or its export for detection.backend, set by load_model
+model_path = MODEL_PATH
+
+# Input size the model letterboxes every image to
+MODEL_IMGSZ = 640
+
+# Client capture settings, overridden by capture in config.json
+CAPTURE_DEFAULTS = {
+    'roi': [0.0, 0.0, 1.0, 1.0],  # Card strip as left, top, right, bottom fractions of the camera frame
+    'jpeg_quality': 0.8,          # canvas.toBlob JPEG quality (0-1)
+    'downscale': True,            # Shrink frames to what the model needs before encoding
+    'reduced_decode': True        # Decode large frames at 1/2, 1/4 or 1/8 resolution on the server
+}
+
+# Detection modes: crop each zone and batch the crops, or run once on the whole frame
+DETECTION_MODES = ('zones', 'full_frame')
+
+# Longest time the stream endpoint waits for a frame's result before replying
+STREAM_RESULT_TIMEOUT = 10.0
+
+# Mean thumbnail difference (0-255) above which a zone is re-detected, when
+# config.json does not set detection.change_threshold (0 re-detects every frame)
+DEFAULT_CHANGE_THRESHOLD = 8.0
+
+# Detect-then-track settings, overridden by detection.tracking in config.json
+TRACKING_DEFAULTS = {
+    'enabled': False,
+    'keyframe_interval': 10,  # Detect the zones carried by the tracker again on every Nth frame
+    'carry_threshold': 24.0,  # Largest thumbnail change (0-255) since detection a zone may be carried with
+    'match_threshold': 0.7,   # Template match score for a card to count as still there
+    'max_shift': 0.25,        # Farthest a tracked card may have moved, as a fraction of its size
+    'empty_after': 3          # Consecutive empty frames before a slot is reported empty
+}
+
+# Zones per predict call when config.json does not set detection.batch_size
+DEFAULT_BATCH_SIZE = 8
+
+# Prefix of the metric names on /metrics
+METRICS_PREFIX = 'card_reader'
+
+# Hand file for external readers, replaced atomically whenever the hand changes
+HAND_FILE = 'latest_hand.json'
+
+# Default and longest wait of a /hand?since= long-poll, in seconds
+HAND_POLL_TIMEOUT = 25.0
+HAND_POLL_MAX_TIMEOUT = 60.0
+
+# Table used when a request does not pass ?table=; its hand goes to HAND_FILE
+DEFAULT_TABLE = 'default'
+
+# Table ids are used in file names, so only letters, digits, '-' and '_'
+TABLE_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,32}')
+
+# Most tables one server keeps state for
+MAX_TABLES = 64
+
+# Cross-table inference batching, overridden by scheduler in config.json
+SCHEDULER_DEFAULTS = {
+    'max_batch': 16,   # Most images (zones or frames, from all tables) per model call
+    'max_wait_ms': 5   # Longest time the first waiting image waits for others to join its batch
+}
+
 def load_config():
     """Load configuration from config.json"""
     global config
     with config_lock:
         with open('config.json', 'r') as f:
             config = json.load(f)
+    configure_scheduler()
     return config
 
+def load_model():
+    """Load and warm up the YOLO model once for the whole process
+
+    detection.backend in config.json picks the inference backend (torch, onnx
+    or openvino, with detection.int8 for the quantized variant, calibrated on
+    the dataset yaml detection.calibration_data); the converted
+    model is exported on first use and cached next to MODEL_PATH.
+    """
+    global model_path
+    detection = config.get('detection', {})
+    backend = detection.get('backend', 'torch')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    model_path = export_weights(MODEL_PATH, backend, detection.get('int8', False),
+                                calibration_data=detection.get('calibration_data'))
+    model = get_model(model_path)
+    for stats in model_stats():
+        print(f"Loaded {stats['weights_path']} in {stats['load_ms']} ms "
+              f"(warm-up {stats['warmup_ms']} ms)", file=sys.stderr)
+    return model
+
 def save_config(new_config):
     """Save configuration to config.json"""
     global config
@@ -57,6 +130,26 @@ def save_config(new_config):
         config = new_config
         with open('config.json', 'w') as f:
             json.dump(config, f, indent=2)
+    configure_scheduler()
+
+def table_detection_config(table_id):
+    """Detection settings of a table: detection in config.json, updated by tables.<table_id>"""
+    detection = config.get('detection', {})
+    return {**detection, **config.get('tables', {}).get(table_id, {})}
+
+def configure_scheduler():
+    """Apply the scheduler settings of config.json to the inference scheduler
+
+    The shared batches run at the lowest confidence threshold of any table;
+    each table then keeps only its own boxes above its threshold.
+    """
+    global scheduler_confidence
+    settings = {**SCHEDULER_DEFAULTS, **config.get('scheduler', {})}
+    inference_scheduler.configure(settings['max_batch'], settings['max_wait_ms'] / 1000)
+    thresholds = [config.get('detection', {}).get('confidence_threshold', 0.5)]
+    thresholds += [table['confidence_threshold'] for table in config.get('tables', {}).values()
+                   if 'confidence_threshold' in table]
+    scheduler_confidence = min(thresholds)
 
 
 def split_image_vertical(image, num_zones):
@@ -73,55 +166,182 @@ def split_image_vertical(image, num_zones):
 
     return zones
 
-def detect_cards_in_zones(image, num_zones, confidence_threshold):
-    """Detect cards in each zone and return results"""
-    zones = split_image_vertical(image, num_zones)
-    results = []
-    card_presence = []
-    temp_files = []
+def carried_results(tracker, change_detector, crops, thumbs, dirty, match_threshold, max_shift, carry_threshold,
+                    keyframe=False, timings=None):
+    """Results the tracker carries forward for changed zones, None for the zones that need detection
+
+    Between keyframes, a changed zone whose thumbnail differs by at most
+    carry_threshold from when it was last detected keeps its previous result
+    while its card is still found near its old box. On a keyframe no zone is
+    carried, so the carried ones are detected again.
+    """
+    results = [None] * len(crops)
+    if tracker is None or change_detector is None or keyframe:
+        return results
+    with stage_timer(timings, 'track'):
+        for i, crop in enumerate(crops):
+            if not dirty[i]:
+                continue
+            difference = change_detector.difference(i, thumbs[i])
+            if difference is not None and difference <= carry_threshold:
+                tracked = tracker.track(i, crop, match_threshold, max_shift, carry=True)
+                if tracked is not None:
+                    results[i] = dict(tracked, tracked=True)
+    return results
+
+def held_result(tracker, zone, crop, result, match_threshold, max_shift, timings=None):
+    """Return the zone's previous result if detection missed its card but the tracker still finds it, else None"""
+    if tracker is None or result['has_card']:
+        return None
+    with stage_timer(timings, 'track'):
+        tracked = tracker.track(zone, crop, match_threshold, max_shift)
+    return None if tracked is None else dict(tracked, tracked=True)
+
+def detect_cards_in_zones(image, num_zones, confidence_threshold, batch_size=DEFAULT_BATCH_SIZE,
+                          change_detector=None, change_threshold=0, tracker=None, match_threshold=0,
+                          max_shift=0, carry_threshold=0, keyframe=False, timings=None, detect_boxes=None):
+    """Detect cards in each zone and return results
+
+    With a change_detector, zones that look the same as when they were last
+    detected reuse that result instead of going through the model. With a
+    tracker, slightly changed zones are carried forward between keyframes
+    (see carried_results), and a zone where the model finds no card keeps its
+    previous result while that card is still found near its old box. On a
+    keyframe the zones carried since their last detection are detected again.
+    Time spent per stage is added to the timings dict if one is given.
+    detect_boxes(images, conf) replaces the direct model call, e.g. to batch
+    with other tables.
+    """
+    with stage_timer(timings, 'split'):
+        zones = split_image_vertical(image, num_zones)
+    crops = [zone for zone, _, _ in zones]
+    model = get_model(model_path)
+
+    if change_detector is not None:
+        settings = ('zones', image.shape[:2], num_zones, confidence_threshold)
+        with stage_timer(timings, 'change_check'):
+            dirty, thumbs = change_detector.check(crops, change_threshold, settings)
+    else:
+        dirty, thumbs = [True] * len(zones), None
+    if tracker is not None and keyframe:
+        dirty = [dirty[i] or tracker.carried(i) for i in range(len(zones))]
+    results = carried_results(tracker, change_detector, crops, thumbs, dirty, match_threshold, max_shift,
+                              carry_threshold, keyframe, timings)
+    detect_zones = [i for i in range(len(zones)) if dirty[i] and results[i] is None]
+
+    # Zones that need detection go through the model together (the zones are views of the frame, no file I/O)
+    failed = False
+    try:
+        with stage_timer(timings, 'detect'):
+            if detect_boxes is not None:
+                zone_boxes = detect_boxes([crops[i] for i in detect_zones], confidence_threshold)
+            else:
+                zone_boxes = detect_card_boxes_batch([crops[i] for i in detect_zones], model,
+                                                     conf=confidence_threshold, batch_size=batch_size)
+    except Exception as e:
+        print(f"Error detecting cards in zones: {e}", file=sys.stderr)
+        zone_boxes = [[] for _ in detect_zones]
+        failed = True
+
+    for i, boxes in zip(detect_zones, zone_boxes):
+        _, x_start, x_end = zones[i]
+        results[i] = zone_result(i, x_start, x_end, boxes)
+        held = held_result(tracker, i, crops[i], results[i], match_threshold, max_shift, timings)
+        if held is not None:
+            # Not cached: the zone is detected again on the next frame
+            results[i] = held
+            if change_detector is not None:
+                change_detector.store(i, thumbs[i], None)
+            continue
+        if change_detector is not None:
+            change_detector.store(i, thumbs[i], None if failed else results[i])
+        if tracker is not None and not failed:
+            tracker.update(i, crops[i], card_box(boxes, results[i]), results[i])
+    for i in range(len(zones)):
+        if results[i] is None:
+            results[i] = dict(change_detector.cached_result(i), cached=True)
+
+    card_presence = [result['has_card'] for result in results]
 
+    return results, card_presence
+
+def detect_cards_full_frame(image, num_zones, confidence_threshold, change_detector=None, change_threshold=0,
+                            tracker=None, match_threshold=0, max_shift=0, carry_threshold=0, keyframe=False,
+                            timings=None, detect_boxes=None):
+    """Detect cards on the whole frame once and assign each box to a zone by its x-center
+
+    With a change_detector, the frame is only re-detected when at least one
+    zone changed and could not be carried forward by the tracker (see
+    carried_results); otherwise every zone reuses its previous result. With a
+    tracker, a zone where the model finds no card keeps its previous result
+    while that card is still found near its old box. On a keyframe, zones
+    carried since their last detection count as changed. Time spent per stage
+    is added to the timings dict if one is given. detect_boxes(images, conf)
+    replaces the direct model call.
+    """
+    with stage_timer(timings, 'split'):
+        zones = split_image_vertical(image, num_zones)
+    crops = [zone for zone, _, _ in zones]
+    model = get_model(model_path)
+
+    if change_detector is not None:
+        settings = ('full_frame', image.shape[:2], num_zones, confidence_threshold)
+        with stage_timer(timings, 'change_check'):
+            dirty, thumbs = change_detector.check(crops, change_threshold, settings)
+    else:
+        dirty, thumbs = [True] * len(zones), None
+    if tracker is not None and keyframe:
+        dirty = [dirty[i] or tracker.carried(i) for i in range(len(zones))]
+    results = carried_results(tracker, change_detector, crops, thumbs, dirty, match_threshold, max_shift,
+                              carry_threshold, keyframe, timings)
+
+    # Every zone is clean or carried: the frame does not go through the model
+    if all(not dirty[i] or results[i] is not None for i in range(len(zones))):
+        for i in range(len(zones)):
+            if results[i] is None:
+                results[i] = dict(change_detector.cached_result(i), cached=True)
+        return results, [result['has_card'] for result in results]
+
+    failed = False
     try:
-        for i, (zone, x_start, x_end) in enumerate(zones):
-            # Save zone as temporary image
-            temp_path = f'temp_zone_{i}.jpg'
-            cv2.imwrite(temp_path, zone)
-            temp_files.append(temp_path)
-
-            # Detect cards in zone
-            try:
-                detected_cards_str = detect_cards(temp_path, MODEL_PATH, conf=confidence_threshold)
-                # Convert to tuples (rank, suit)
-                detected_cards = [card_string_to_tuple(c) for c in detected_cards_str]
-                detected_cards = [c for c in detected_cards if c is not None]  # Filter invalid
-                has_card = len(detected_cards) > 0
-                card_presence.append(has_card)
-
-                results.append({
-                    'zone': i,
-                    'x_start': x_start,
-                    'x_end': x_end,
-                    'cards': detected_cards,  # List of tuples like [(14, 'H'), (2, 'S')]
-                    'cards_str': detected_cards_str,  # Original strings like ['AH', '2S']
-                    'has_card': has_card
-                })
-            except Exception as e:
-                print(f"Error detecting cards in zone {i}: {e}")
-                card_presence.append(False)
-                results.append({
-                    'zone': i,
-                    'x_start': x_start,
-                    'x_end': x_end,
-                    'cards': [],
-                    'has_card': False
-                })
-    finally:
-        # Clean up all temp files after processing
-        for temp_path in temp_files:
-            try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except Exception as e:
-                print(f"Warning: Could not remove {temp_path}: {e}")
+        with stage_timer(timings, 'detect'):
+            if detect_boxes is not None:
+                boxes = detect_boxes([image], confidence_threshold)[0]
+            else:
+                boxes = detect_card_boxes(image, model, conf=confidence_threshold)
+    except Exception as e:
+        print(f"Error detecting cards in frame: {e}", file=sys.stderr)
+        boxes = []
+        failed = True
+
+    # Keep the highest-confidence card whose center falls inside each zone
+    best_boxes = [None] * len(zones)
+    for box in boxes:
+        x_center = (box['x1'] + box['x2']) / 2
+        for i, (_, x_start, x_end) in enumerate(zones):
+            if x_start <= x_center < x_end:
+                if best_boxes[i] is None or box['confidence'] > best_boxes[i]['confidence']:
+                    best_boxes[i] = box
+                break
+
+    results = [zone_result(i, x_start, x_end, [best_boxes[i]] if best_boxes[i] else [])
+               for i, (_, x_start, x_end) in enumerate(zones)]
+    for i, result in enumerate(results):
+        held = held_result(tracker, i, crops[i], result, match_threshold, max_shift, timings)
+        if held is not None:
+            # Not cached: the zone counts as changed on the next frame
+            results[i] = held
+            if change_detector is not None:
+                change_detector.store(i, thumbs[i], None)
+            continue
+        if change_detector is not None:
+            change_detector.store(i, thumbs[i], None if failed else result)
+        if tracker is not None and not failed:
+            # Template boxes are kept in zone coordinates
+            box = best_boxes[i] and dict(best_boxes[i], x1=best_boxes[i]['x1'] - zones[i][1],
+                                         x2=best_boxes[i]['x2'] - zones[i][1])
+            tracker.update(i, crops[i], box, result)
+    card_presence = [result['has_card'] for result in results]
 
     return results, card_presence
 
@@ -132,63 +352,344 @@ def index():
 
 @app.route('/config', methods=['GET', 'POST'])
 def config_endpoint():
-    """Get or update configuration"""
+    """Get or update configuration
+
+    GET also returns the frame layout the client needs to size its uploads,
+    for the table given by ?table= (its tables.<id> overrides applied).
+    """
+    table_id = request.args.get('table') or DEFAULT_TABLE
     if request.method == 'GET':
-        return jsonify(config)
+        return jsonify({**config, 'layout': frame_layout(table_id)})
     elif request.method == 'POST':
         new_config = request.json
+        new_config.pop('layout', None)  # Derived, not a setting
         save_config(new_config)
-        return jsonify({'status': 'success', 'config': config})
+        return jsonify({'status': 'success', 'config': {**config, 'layout': frame_layout(table_id)}})
+
+def frame_layout(table_id=DEFAULT_TABLE):
+    """Model input size, capture settings and zone boundaries of a table for the client
+
+    Zone boundaries are fractions of the region of interest; frames are
+    expected to be cropped to that region before upload.
+    """
+    detection = table_detection_config(table_id)
+    num_zones = detection.get('num_cards', 1)
+    return {
+        'imgsz': MODEL_IMGSZ,
+        'mode': detection.get('mode', 'zones'),
+        'num_zones': num_zones,
+        'zones': [[i / num_zones, (i + 1) / num_zones] for i in range(num_zones)],
+        'capture': {**CAPTURE_DEFAULTS, **config.get('capture', {})}
+    }
 
 @app.route('/hand', methods=['GET'])
-def get_hand():
-    """Return the latest detected hand."""
-    if latest_hand is None:
-        return jsonify({'status': 'no_data', 'hand': []})
-    return jsonify({'status': 'success', 'hand': latest_hand})
+@app.route('/tables/<table_id>/hand', methods=['GET'])
+def get_hand(table_id=None):
+    """Return the latest detected hand of a table and its version.
+
+    The table is the one in the URL or ?table=, else the default table. With
+    ?since=<version>, wait (up to ?timeout= seconds) until the hand changes
+    from that version; status is 'unchanged' if it did not.
+    """
+    session = request_session(table_id)
+    hand_store = session.hand_store
+    since = request.args.get('since', type=int)
+    if since is None:
+        version, hand = hand_store.get()
+        changed = True
+    else:
+        timeout = min(request.args.get('timeout', HAND_POLL_TIMEOUT, type=float), HAND_POLL_MAX_TIMEOUT)
+        version, hand, changed = hand_store.wait_for_change(since, timeout)
+
+    if hand is None:
+        return jsonify({'status': 'no_data', 'table': session.table_id, 'hand': [], 'version': version})
+    return jsonify({'status': 'success' if changed else 'unchanged', 'table': session.table_id,
+                    'hand': hand.tuples(), 'version': version})
+
+@app.route('/model_stats', methods=['GET'])
+def get_model_stats():
+    """Return model load time and steady-state inference latency."""
+    return jsonify({'status': 'success', 'models': model_stats()})
+
+def process_frame(frame_bytes, session):
+    """Decode an uploaded JPEG frame, detect cards and publish the hand of the frame's table"""
+    start = time.perf_counter()
+    timings = {}
+
+    detection = table_detection_config(session.table_id)
+    num_zones = detection['num_cards']
+    mode = detection.get('mode', 'zones')
+    capture = {**CAPTURE_DEFAULTS, **config.get('capture', {})}
+
+    # Frames larger than the model needs are decoded at reduced resolution
+    with stage_timer(timings, 'decode'):
+        image, decode_scale = decode_frame(frame_bytes, num_zones, MODEL_IMGSZ, mode, capture['reduced_decode'])
+    if image is None:
+        raise ValueError("Could not decode frame")
+
+    results, card_presence, hand, keyframe = detect_hand(image, detection, session.zone_changes,
+                                                         session.hand_tracker, timings, scheduled_card_boxes)
+    session.card_results = results
+
+    # Publish for /hand and the hand file (only written when the hand changed)
+    with stage_timer(timings, 'write'):
+        hand_version, _ = session.hand_store.publish(hand)
+
+    timings['total'] = time.perf_counter() - start
+    frame_metrics.record(timings)
+    frame_metrics.increment('frames')
+    frame_metrics.increment('zones', len(results))
+    frame_metrics.increment('zones_cached', sum(result['cached'] for result in results))
+    frame_metrics.increment('zones_tracked', sum(result['tracked'] for result in results))
+
+    return {
+        'table': session.table_id,
+        'results': results,
+        'card_presence': card_presence,
+        'hand': hand.tuples(),  # e.g., [(14, 'H'), None, (2, 'S'), None, None]
+        'hand_version': hand_version,
+        'cache': session.zone_changes.stats(),  # Per-zone cache hits/misses
+        'keyframe': keyframe,
+        'decode_scale': decode_scale,  # Zone x positions are in pixels of the frame shrunk by this factor
+        'timings': {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}  # ms per stage
+    }
+
+def detect_hand(image, detection, zone_changes=None, hand_tracker=None, timings=None, detect_boxes=None):
+    """Run a decoded frame through the detection pipeline configured by detection settings
+
+    Used for uploaded frames and by process_recording.py. zone_changes and
+    hand_tracker carry state from frame to frame (tracking is only used when
+    detection.tracking is enabled). Returns (results, card_presence, hand,
+    keyframe), with hand a cards.Hand of one card or None per zone.
+    """
+    num_zones = detection['num_cards']
+    mode = detection.get('mode', 'zones')
+    confidence_threshold = detection['confidence_threshold']
+    batch_size = detection.get('batch_size', DEFAULT_BATCH_SIZE)
+    change_threshold = detection.get('change_threshold', DEFAULT_CHANGE_THRESHOLD)
+    tracking = {**TRACKING_DEFAULTS, **detection.get('tracking', {})}
+
+    # The tracker carries slightly changed zones between keyframes and holds cards the model misses
+    tracker = hand_tracker if tracking['enabled'] else None
+    keyframe = False
+    if tracker is not None:
+        keyframe = tracker.next_frame(tracking['keyframe_interval'], (mode, num_zones, confidence_threshold))
+
+    if mode == 'full_frame':
+        results, card_presence = detect_cards_full_frame(image, num_zones, confidence_threshold,
+                                                         zone_changes, change_threshold,
+                                                         tracker, tracking['match_threshold'], tracking['max_shift'],
+                                                         tracking['carry_threshold'], keyframe,
+                                                         timings, detect_boxes)
+    elif mode == 'zones':
+        results, card_presence = detect_cards_in_zones(image, num_zones, confidence_threshold, batch_size,
+                                                       zone_changes, change_threshold,
+                                                       tracker, tracking['match_threshold'], tracking['max_shift'],
+                                                       tracking['carry_threshold'], keyframe,
+                                                       timings, detect_boxes)
+    else:
+        raise ValueError(f"Unknown detection mode '{mode}', expected one of {DETECTION_MODES}")
+
+    # Build the hand: first detected card per zone, or None if empty
+    hand = Hand(result['card_ids'][0] if result['card_ids'] else None for result in results)
+
+    # Slots only turn empty after several empty frames in tracking mode
+    if tracker is not None:
+        hand = Hand(tracker.stabilize(hand, tracking['empty_after']))
+
+    return results, card_presence, hand, keyframe
+
+def scheduled_card_boxes(images, conf):
+    """Detect card boxes on images in a batch shared with the other tables, keeping boxes above conf"""
+    return [[box for box in boxes if box['confidence'] >= conf] for boxes in inference_scheduler.run(images)]
+
+def run_inference_batch(images):
+    """Run one scheduler batch through the shared model"""
+    return detect_card_boxes_batch(images, get_model(model_path), conf=scheduler_confidence,
+                                   batch_size=inference_scheduler.max_batch)
+
+# Zones and frames of all tables go through the one model in shared batches
+inference_scheduler = BatchScheduler(run_inference_batch, SCHEDULER_DEFAULTS['max_batch'],
+                                     SCHEDULER_DEFAULTS['max_wait_ms'] / 1000, name='inference-scheduler')
+
+# Confidence threshold of the shared batches, the lowest of all tables (set by configure_scheduler)
+scheduler_confidence = 0.0
+
+class TableSession:
+    """Detection state of one table (one camera): zone cache, tracker, hand and frame worker"""
+
+    def __init__(self, table_id):
+        self.table_id = table_id
+        hand_file = HAND_FILE if table_id == DEFAULT_TABLE else f'latest_hand_{table_id}.json'
+
+        # Last processed crop and result per zone, used to skip unchanged zones
+        self.zone_changes = ZoneChangeDetector()
+
+        # Card templates and stable hand for detect-then-track mode
+        self.hand_tracker = HandTracker()
+
+        # Versioned latest hand behind /hand and the hand file
+        self.hand_store = HandStore(hand_file)
+
+        # Latest results per zone
+        self.card_results = []
+
+        # Detection runs on the table's own thread; uploads only hand frames over to it.
+        # The model calls of all tables' workers meet in the inference scheduler.
+        self.inference_worker = LatestFrameWorker(lambda frame_bytes: process_frame(frame_bytes, self),
+                                                  name=f'inference-{table_id}')
+
+    def stats(self):
+        """Return the worker, zone cache, tracker and hand store counters of the table"""
+        return {'worker': self.inference_worker.stats(), 'zone_cache': self.zone_changes.stats(),
+                'tracker': self.hand_tracker.stats(), 'hand_store': self.hand_store.stats()}
+
+# Table sessions by table id, created on a table's first frame
+sessions = {}
+sessions_lock = Lock()
+
+def get_session(table_id=None, create=True):
+    """Return the session of a table (the default table if table_id is empty)
+
+    The session is created if needed when create is set; otherwise None is
+    returned for a table without one.
+    """
+    table_id = table_id or DEFAULT_TABLE
+    if not TABLE_ID_PATTERN.fullmatch(table_id):
+        raise ValueError(f"Invalid table id '{table_id}', expected 1-32 letters, digits, '-' or '_'")
+    with sessions_lock:
+        session = sessions.get(table_id)
+        if session is None and create:
+            if len(sessions) >= MAX_TABLES:
+                raise ValueError(f"Too many tables (at most {MAX_TABLES})")
+            session = sessions[table_id] = TableSession(table_id)
+        return session
+
+def request_session(table_id=None, create=False):
+    """Session of the given table or the one named by ?table=
+
+    Only frame uploads (create) start sessions for new table ids. Reads get a
+    404 for a table without a session, except for the default table and the
+    tables configured under tables in config.json, whose hand can be waited
+    for before their first frame. 400 for an invalid id or too many tables.
+    """
+    table_id = table_id or request.args.get('table') or DEFAULT_TABLE
+    create = create or table_id == DEFAULT_TABLE or table_id in config.get('tables', {})
+    try:
+        session = get_session(table_id, create)
+    except ValueError as e:
+        abort(400, str(e))
+    if session is None:
+        abort(404, f"Unknown table '{table_id}'")
+    return session
+
+# Per-stage frame latencies and frame/zone counters, over all tables
+frame_metrics = LatencyMetrics()
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """Return the scheduler batch counters, stage latencies and per-table counters
+
+    With ?table=, the default table's fields are replaced by that table's:
+    inference queue depth, frame counters, zone cache, tracker and hand store.
+    """
+    session = request_session()
+    with sessions_lock:
+        tables = list(sessions.values())
+    return jsonify({'status': 'success', 'table': session.table_id, **session.stats(),
+                    'latency': frame_metrics.snapshot(), 'scheduler': inference_scheduler.stats(),
+                    'tables': {table.table_id: table.stats() for table in tables}})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Stage latency percentiles and counters in the Prometheus text format"""
+    with sessions_lock:
+        tables = list(sessions.values())
+        default_session = sessions.get(DEFAULT_TABLE)
+    workers = [table.inference_worker.stats() for table in tables]
+    scheduler = inference_scheduler.stats()
+    text = frame_metrics.prometheus(
+        METRICS_PREFIX,
+        extra_counters={'frames_submitted': sum(worker['submitted'] for worker in workers),
+                        'frames_dropped': sum(worker['dropped'] for worker in workers),
+                        'frame_errors': sum(worker['errors'] for worker in workers),
+                        'inference_batches': scheduler['batches'],
+                        'inference_batch_images': scheduler['images'],
+                        'inference_batch_errors': scheduler['errors']},
+        gauges={'queue_depth': sum(worker['queue_depth'] for worker in workers),
+                'tables': len(tables),
+                'scheduler_pending_requests': scheduler['pending_requests'],
+                'hand_version': default_session.hand_store.stats()['version'] if default_session else 0})
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
+def wants_timings():
+    """Whether the request asked for the per-stage timing breakdown (?timings=1)"""
+    return request.args.get('timings', '').lower() in ('1', 'true', 'yes')
+
+def frame_response(session, frame_seq, timings=False):
+    """Build the response for an uploaded frame from the table's latest completed result
+
+    If the most recently finished frame failed (e.g. it could not be decoded),
+    status is 'error' with its message instead of the older result. The
+    per-stage timing breakdown of the result is only included if timings is set.
+    """
+    result_seq, result = session.inference_worker.latest()
+    error_seq, error = session.inference_worker.latest_error()
+    response = {
+        'status': 'success' if result is not None else 'pending',
+        'table': session.table_id,
+        'frame_seq': frame_seq,    # Sequence number of the uploaded frame
+        'result_seq': result_seq,  # Sequence number of the frame the result belongs to
+        'queue': session.inference_worker.stats()
+    }
+    if error_seq is not None and (result_seq is None or error_seq > result_seq):
+        response.update({'status': 'error', 'error_seq': error_seq, 'message': error})
+    elif result is not None:
+        response.update(result)
+        if not timings:
+            response.pop('timings', None)
+    return response
 
 @app.route('/upload_frame', methods=['POST'])
 def upload_frame():
-    """Receive frame from phone camera"""
-    global card_results, latest_hand
+    """Receive frame from phone camera
 
+    The frame is queued for the inference worker of the table given by
+    ?table= (replacing any frame still waiting) and the table's most recent
+    completed result is returned immediately.
+    """
+    session = request_session(create=True)
     try:
         # Get image from request
         file = request.files['frame']
-        npimg = np.frombuffer(file.read(), np.uint8)
-        image = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
-
-        # Process image
-        num_zones = config['detection']['num_cards']
-        confidence_threshold = config['detection']['confidence_threshold']
-
-        results, card_presence = detect_cards_in_zones(image, num_zones, confidence_threshold)
-
-        # Build hand list: first detected card per zone, or None if empty
-        hand = []
-        for result in results:
-            if result['cards'] and len(result['cards']) > 0:
-                hand.append(result['cards'][0])  # Take first card in zone
-            else:
-                hand.append(None)
-
-        # Store for /hand endpoint
-        latest_hand = hand
-
-        # Write to file for external access
-        with open('latest_hand.json', 'w') as f:
-            json.dump({'hand': hand}, f)
-
-        return jsonify({
-            'status': 'success',
-            'results': results,
-            'card_presence': card_presence,
-            'hand': hand  # e.g., [(14, 'H'), None, (2, 'S'), None, None]
-        })
+        frame_seq = session.inference_worker.submit(file.read())
+        return jsonify(frame_response(session, frame_seq, wants_timings()))
     except Exception as e:
-        print(f"Error processing frame: {e}")
+        print(f"Error receiving frame: {e}", file=sys.stderr)
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@sock.route('/stream')
+def stream(ws):
+    """Persistent frame channel: binary JPEG frames in, JSON results out
+
+    Each frame is answered once it (or a newer frame) has been processed, so a
+    client that waits for the reply before sending again runs at the speed of
+    inference. Connect to /stream?table=<id> to stream a table other than the
+    default one, and add timings=1 to get per-stage timings with each result.
+    """
+    session = request_session(create=True)
+    timings = wants_timings()
+    while True:
+        frame = ws.receive()
+        if not isinstance(frame, (bytes, bytearray)):
+            # Answer anyway, a client waiting for the reply would otherwise stall
+            ws.send(json.dumps({'status': 'error', 'table': session.table_id,
+                                'message': 'expected a binary JPEG frame'}))
+            continue
+        frame_seq = session.inference_worker.submit(bytes(frame))
+        session.inference_worker.wait_for_result(frame_seq, timeout=STREAM_RESULT_TIMEOUT)
+        ws.send(json.dumps(frame_response(session, frame_seq, timings)))
+
 if __name__ == '__main__':
     import argparse
 
@@ -200,6 +701,12 @@ if __name__ == '__main__':
     # Load config
     load_config()
 
+    # Load the model once, before the first frame arrives. debug=True runs the
+    # server in a child process restarted on code changes; the parent only
+    # watches files, so the model is only loaded in the child.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        load_model()
+
     if args.https:
         # Generate self-signed certificate if it doesn't exist
         cert_file = 'cert.pem'
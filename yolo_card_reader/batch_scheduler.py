@@ -0,0 +1,141 @@
+import time
+from threading import Condition, Event, Thread
+
+# Largest number of images per model call, and longest time the first image
+# of a batch waits for more images, unless configured otherwise
+DEFAULT_MAX_BATCH = 16
+DEFAULT_MAX_WAIT = 0.005
+
+
+class _Request:
+    def __init__(self, images):
+        self.images = images
+        self.results = None
+        self.error = None
+        self.done = Event()
+        self.arrived = time.perf_counter()
+
+
+class BatchScheduler:
+    """Run images from many callers through one model in shared batches
+
+    Callers (e.g. the frame workers of several tables) hand over their images
+    with run() and block until their results are ready. A single scheduler
+    thread takes everything that is waiting and sends it to run_batch as one
+    batch. A batch is started as soon as max_batch images are waiting, or
+    when the oldest waiting request has waited max_wait seconds, so a lone
+    caller pays at most max_wait of extra latency.
+    """
+
+    def __init__(self, run_batch, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT,
+                 name='batch-scheduler'):
+        self._run_batch = run_batch  # list of images -> list of results, one per image
+        self._name = name
+        self._cond = Condition()
+        self._thread = None
+        self._pending = []  # requests waiting for a batch, oldest first
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self._batches = 0
+        self._images = 0
+        self._requests = 0
+        self._largest_batch = 0
+        self._errors = 0
+        self._busy_time = 0.0
+
+    def configure(self, max_batch=None, max_wait=None):
+        """Change the batch size limit and the wait deadline"""
+        with self._cond:
+            if max_batch is not None:
+                self.max_batch = max(1, int(max_batch))
+            if max_wait is not None:
+                self.max_wait = max(0.0, float(max_wait))
+            self._cond.notify_all()
+
+    def start(self):
+        """Start the scheduler thread (no-op if already running)"""
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._loop, name=self._name, daemon=True)
+                self._thread.start()
+
+    def run(self, images):
+        """Run images through the model with other callers' images, return one result per image"""
+        if not images:
+            return []
+        self.start()
+        request = _Request(list(images))
+        with self._cond:
+            self._pending.append(request)
+            self._requests += 1
+            self._cond.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def stats(self):
+        """Return batch counters"""
+        with self._cond:
+            return {
+                'max_batch': self.max_batch,
+                'max_wait_ms': round(self.max_wait * 1000, 2),
+                'pending_requests': len(self._pending),
+                'requests': self._requests,
+                'batches': self._batches,
+                'images': self._images,
+                'mean_batch_size': round(self._images / self._batches, 2) if self._batches else None,
+                'largest_batch': self._largest_batch,
+                'errors': self._errors,
+                'busy_ms': round(self._busy_time * 1000, 2),
+            }
+
+    def _take_batch(self):
+        # Whole requests, oldest first, up to max_batch images (a larger request goes alone)
+        batch = [self._pending.pop(0)]
+        size = len(batch[0].images)
+        while self._pending and size + len(self._pending[0].images) <= self.max_batch:
+            size += len(self._pending[0].images)
+            batch.append(self._pending.pop(0))
+        return batch, size
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending:
+                        waiting = sum(len(request.images) for request in self._pending)
+                        remaining = self._pending[0].arrived + self.max_wait - time.perf_counter()
+                        if waiting >= self.max_batch or remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                batch, size = self._take_batch()
+
+            images = [image for request in batch for image in request.images]
+            start = time.perf_counter()
+            try:
+                results = self._run_batch(images)
+                error = None
+            except Exception as e:
+                results = None
+                error = e
+
+            offset = 0
+            for request in batch:
+                if error is None:
+                    request.results = results[offset:offset + len(request.images)]
+                    offset += len(request.images)
+                else:
+                    request.error = error
+                request.done.set()
+
+            with self._cond:
+                self._batches += 1
+                self._images += size
+                self._largest_batch = max(self._largest_batch, size)
+                self._busy_time += time.perf_counter() - start
+                if error is not None:
+                    self._errors += 1
@@ -0,0 +1,178 @@
+"""Micro-benchmarks for the poker analysis and card parsing hot paths
+
+Every benchmark runs on fixed, seeded inputs and reports operations per
+second and peak traced memory. Results are compared with a stored baseline;
+the run fails when any benchmark is slower than the baseline by more than the
+regression threshold, or needs more memory than the memory threshold allows.
+
+Usage:
+    python benchmarks.py                    # run and compare with benchmark_baseline.json
+    python benchmarks.py --save-baseline    # run and store the results as the new baseline
+    python benchmarks.py --threshold 0.3 --memory-threshold 1.0 --only analyze_hand
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Import the analyzer and the card tables from the YOLO repo (no model or server needed)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'yolo11-poker-hand-detection-and-analysis-main'))
+import analyze_hand
+import cards
+from zone_results import zone_result
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_THRESHOLD = 0.25  # fail when ops/sec drops more than 25% below the baseline
+DEFAULT_MEMORY_THRESHOLD = 0.5  # fail when peak memory grows more than 50% above the baseline
+MEMORY_SLACK_KB = 4.0  # ...and by more than this, so benchmarks that allocate next to nothing do not flap
+SEED = 1234
+
+# Card names as produced by the detector
+DETECTED_CARDS = list(cards.CARD_NAMES)
+
+
+def seeded_states(table_count, count, rng):
+    """Random (table_cards, hand_cards) states in analyze_hand notation"""
+    deck = analyze_hand.generate_deck()
+    states = []
+    for _ in range(count):
+        cards = rng.sample(deck, table_count + 2)
+        states.append((cards[:table_count], cards[table_count:]))
+    return states
+
+
+def detected_boxes(count, rng):
+    """Random zone box lists as produced by the detector, one to three boxes each"""
+    boxes = []
+    for _ in range(count):
+        zone = []
+        for _ in range(rng.randint(1, 3)):
+            x1 = rng.uniform(0, 200)
+            zone.append({'card': rng.randrange(len(cards.DECK)), 'confidence': rng.random(),
+                         'x1': x1, 'y1': 0.0, 'x2': x1 + 80, 'y2': 120.0})
+        boxes.append(zone)
+    return boxes
+
+
+def build_benchmarks():
+    """Return {name: (function, number of operations per call)} on seeded inputs"""
+    rng = random.Random(SEED)
+    deck = analyze_hand.generate_deck()
+    seven_card_hands = [analyze_hand.encode_cards(rng.sample(deck, 7)) for _ in range(2000)]
+    flop = seeded_states(3, 5, rng)
+    turn = seeded_states(4, 20, rng)
+    river = seeded_states(5, 200, rng)
+    preflop = seeded_states(0, 200, rng)
+    preflop_live = seeded_states(0, 2, rng)
+    decodable = [[rng.choice(DETECTED_CARDS) for _ in range(5)] for _ in range(10000)]
+    zone_boxes = detected_boxes(10000, rng)
+
+    def run_states(states, **options):
+        def run():
+            for table_cards, hand_cards in states:
+                analyze_hand.analyze_hand(table_cards, hand_cards, cache=False, **options)
+        return run
+
+    def evaluate():
+        for hand in seven_card_hands:
+            analyze_hand.evaluate_hand_int(hand)
+
+    def decode():
+        for names in decodable:
+            cards.decode_cards(names)
+
+    # What the server does with each zone's detected boxes
+    def parse():
+        for i, boxes in enumerate(zone_boxes):
+            zone_result(i, 0, 280, boxes)
+
+    return {
+        'evaluate_hand_int': (evaluate, len(seven_card_hands)),
+        'analyze_hand preflop (table)': (run_states(preflop), len(preflop)),
+        'analyze_hand preflop (numpy)': (run_states(preflop_live, method='numpy', table=False),
+                                         len(preflop_live)),
+        'analyze_hand flop': (run_states(flop, table=False), len(flop)),
+        'analyze_hand turn': (run_states(turn, table=False), len(turn)),
+        'analyze_hand river': (run_states(river, table=False), len(river)),
+        'decode_cards': (decode, len(decodable)),
+        'zone_result': (parse, len(zone_boxes)),
+    }
+
+
+def measure(function, operations, repeat):
+    """Best-of-repeat ops/sec, then peak traced memory of one more call"""
+    function()  # warm up lookup tables and caches
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ops_per_sec': round(operations / best, 1), 'peak_kb': round(peak / 1024, 1)}
+
+
+def compare(results, baseline, threshold, memory_threshold=DEFAULT_MEMORY_THRESHOLD):
+    """Print results next to the baseline and return the names that regressed in speed or memory"""
+    regressions = []
+    print(f"{'benchmark':32} {'ops/sec':>12} {'baseline':>12} {'change':>8} {'peak KB':>9} {'baseline':>9}")
+    for name, result in results.items():
+        reference = baseline.get(name, {}).get('ops_per_sec')
+        shown = f"{reference:,.1f}" if reference else '-'
+        change = f"{result['ops_per_sec'] / reference - 1:+.0%}" if reference else ''
+        peak_reference = baseline.get(name, {}).get('peak_kb')
+        peak_shown = f"{peak_reference:,.1f}" if peak_reference is not None else '-'
+        print(f"{name:32} {result['ops_per_sec']:>12,.1f} {shown:>12} {change:>8} "
+              f"{result['peak_kb']:>9,.1f} {peak_shown:>9}")
+        if reference and result['ops_per_sec'] < reference * (1 - threshold):
+            regressions.append(name)
+        elif (peak_reference is not None
+              and result['peak_kb'] > peak_reference * (1 + memory_threshold) + MEMORY_SLACK_KB):
+            regressions.append(f"{name} (memory)")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the poker analysis and card parsing hot paths')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline results file')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed ops/sec drop relative to the baseline (0.25 = 25%%)')
+    parser.add_argument('--memory-threshold', type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                        help='Allowed peak memory growth relative to the baseline (0.5 = 50%%)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark (best one counts)')
+    parser.add_argument('--only', help='Only run benchmarks whose name contains this text')
+    args = parser.parse_args()
+
+    results = {}
+    for name, (function, operations) in build_benchmarks().items():
+        if args.only and args.only not in name:
+            continue
+        results[name] = measure(function, operations, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    elif not args.save_baseline:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+
+    if args.save_baseline:
+        # Benchmarks skipped with --only keep their previous baseline
+        compare(results, baseline, args.threshold, args.memory_threshold)
+        with open(args.baseline, 'w') as f:
+            json.dump({**baseline, **results}, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        sys.exit(0)
+
+    regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+    if regressions:
+        print(f"Regression above {args.threshold:.0%} (memory: {args.memory_threshold:.0%}): "
+              f"{', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+
+# JPEG start-of-frame markers (baseline, progressive, lossless... but not DHT/JPG/DAC)
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Reduced decode modes by reduction factor, largest first
+REDUCED_MODES = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def jpeg_size(data):
+    """Return (width, height) from a JPEG header without decoding, or None
+
+    Walks the marker segments up to the first start-of-frame marker.
+    """
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # markers without a length
+            i += 2
+            continue
+        length = (data[i + 2] << 8) | data[i + 3]
+        if marker in SOF_MARKERS:
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return width, height
+        i += 2 + length
+    return None
+
+
+def reduction_factor(width, height, num_zones, imgsz, mode='zones'):
+    """Largest decode reduction (1, 2, 4 or 8) that keeps detection at full model resolution
+
+    YOLO letterboxes each input so its longest side becomes imgsz. In zones
+    mode every zone is a separate input (frame width / num_zones by frame
+    height); in full_frame mode the whole frame is. Reducing is only free as
+    long as that longest side stays at least imgsz.
+    """
+    if mode == 'zones':
+        longest = max(width / max(1, num_zones), height)
+    else:
+        longest = max(width, height)
+    for factor, _ in REDUCED_MODES:
+        if longest / factor >= imgsz:
+            return factor
+    return 1
+
+
+def decode_frame(frame_bytes, num_zones, imgsz, mode='zones', reduce=True):
+    """Decode a JPEG frame, at reduced resolution when the model does not need the full one
+
+    Returns (image, factor): the BGR image (None if it cannot be decoded) and
+    the reduction factor applied to both sides.
+    """
+    npimg = np.frombuffer(frame_bytes, np.uint8)
+    size = jpeg_size(frame_bytes) if reduce else None
+    factor = reduction_factor(*size, num_zones, imgsz, mode) if size else 1
+    flag = dict(REDUCED_MODES).get(factor, cv2.IMREAD_COLOR)
+    return cv2.imdecode(npimg, flag), factor
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+from threading import Condition, Lock
+
+
+class HandStore:
+    """Latest detected hand (a cards.Hand) with a version that increases on every change
+
+    Publishing the same hand again is a no-op: the version stays the same and
+    nothing is written. When the hand changes, the version is bumped, waiting
+    readers are woken up and the hand file is replaced atomically (written to
+    a temporary file, then renamed over the old one), so readers never see a
+    half-written file.
+
+    The version carries on from the one stored in an existing hand file, so
+    it keeps increasing across server restarts.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._cond = Condition()
+        self._write_lock = Lock()  # keeps file writes in version order
+        self._hand = None
+        self._version = self._stored_version()
+        self._updated_at = None
+        self._published = 0
+        self._unchanged = 0
+        self._writes = 0
+        self._last_write_time = None
+
+    def _stored_version(self):
+        """Return the version in the hand file, or 0 if there is no readable one"""
+        if self._path is None:
+            return 0
+        try:
+            with open(self._path) as f:
+                version = json.load(f).get('version', 0)
+        except (OSError, ValueError, AttributeError):
+            return 0
+        return version if isinstance(version, int) and version > 0 else 0
+
+    def publish(self, hand):
+        """Store a hand and return (version, changed)"""
+        with self._cond:
+            self._published += 1
+            if hand == self._hand:
+                self._unchanged += 1
+                return self._version, False
+            self._hand = hand
+            self._version += 1
+            self._updated_at = time.time()
+            version = self._version
+
+        # Waiters are woken once the file is in place, so they can read it too
+        if self._path is not None:
+            self._persist(version, hand)
+        with self._cond:
+            self._cond.notify_all()
+        return version, True
+
+    def _persist(self, version, hand):
+        start = time.perf_counter()
+        with self._write_lock:
+            # A newer hand may have been written while this one waited for the lock
+            with self._cond:
+                if version != self._version:
+                    return
+            temp_path = f"{self._path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({'hand': hand.tuples(), 'version': version}, f)
+            os.replace(temp_path, self._path)
+        with self._cond:
+            self._writes += 1
+            self._last_write_time = time.perf_counter() - start
+
+    def get(self):
+        """Return (version, hand); hand is None until the first publish"""
+        with self._cond:
+            return self._version, self._hand
+
+    def wait_for_change(self, since, timeout=None):
+        """Block until the version is newer than since, or the timeout expires
+
+        A since newer than the current version (e.g. seen before the hand
+        file was removed) counts as changed, but only once a hand has been
+        published: a version restored from the hand file comes without its
+        hand, so readers keep waiting for the first one. Returns (version,
+        hand, changed).
+        """
+        with self._cond:
+            changed = self._cond.wait_for(lambda: self._hand is not None and self._version != since, timeout)
+            return self._version, self._hand, changed
+
+    def stats(self):
+        """Return the version and publish/write counters"""
+        with self._cond:
+            return {
+                'version': self._version,
+                'updated_at': self._updated_at,
+                'published': self._published,
+                'unchanged': self._unchanged,
+                'writes': self._writes,
+                'last_write_ms': self._last_write_time and round(self._last_write_time * 1000, 2),
+            }
@@ -0,0 +1,175 @@
+from threading import Lock
+
+import cv2
+
+# Zone crops and card templates are matched at this scale to keep tracking cheap
+TRACK_SCALE = 0.5
+
+
+class HandTracker:
+    """Carry each zone's card between keyframes and stabilize the hand
+
+    After a zone is detected, a grayscale patch of its card is kept as a
+    template. Between keyframes, a zone that changed only slightly since it
+    was detected (e.g. lighting or a nudged card) looks for the template in
+    its crop, and while it is still found near its old box the zone keeps its
+    previous result without going through the model. Such carried zones are
+    detected again on the next keyframe. Zones that changed more, e.g. a card
+    swapped for another one, always go through the model. When the model
+    finds no card in a zone, the template is searched as well and the zone
+    keeps its card if it is still there.
+
+    A slot only becomes empty after empty_after consecutive frames without a
+    card, so a single missed detection does not drop a card from the hand.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._settings = None
+        self._frame = 0
+        self._templates = {}  # zone -> grayscale card patch
+        self._results = {}    # zone -> result the template belongs to
+        self._positions = {}  # zone -> top-left corner of the template in the scaled crop
+        self._carried = set() # zones carried forward since they were last detected
+        self._stable = []     # stabilized card per zone
+        self._empty_runs = [] # consecutive empty frames per zone
+        self._keyframes = 0
+        self._tracked = 0
+        self._lost = 0
+
+    def reset(self):
+        """Forget templates, the stable hand and counters"""
+        with self._lock:
+            self._settings = None
+            self._frame = 0
+            self._templates.clear()
+            self._results.clear()
+            self._positions.clear()
+            self._carried.clear()
+            self._stable = []
+            self._empty_runs = []
+            self._keyframes = self._tracked = self._lost = 0
+
+    def next_frame(self, keyframe_interval, settings=None):
+        """Advance to the next frame and return whether it is a keyframe
+
+        Templates and the stable hand are dropped when settings (zone count,
+        mode...) change; the first frame after that is always a keyframe.
+        """
+        with self._lock:
+            if settings != self._settings:
+                self._settings = settings
+                self._frame = 0
+                self._templates.clear()
+                self._results.clear()
+                self._positions.clear()
+                self._carried.clear()
+                self._stable = []
+                self._empty_runs = []
+            keyframe = self._frame % max(1, int(keyframe_interval)) == 0
+            self._frame += 1
+            if keyframe:
+                self._keyframes += 1
+            return keyframe
+
+    @staticmethod
+    def _gray(image):
+        small = cv2.resize(image, None, fx=TRACK_SCALE, fy=TRACK_SCALE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def update(self, zone, crop, box, result):
+        """Store the card template of a freshly detected zone
+
+        box is the card's box in zone coordinates, or None for an empty zone.
+        """
+        template = position = None
+        if box is not None:
+            # Cut from the scaled crop, so the template lines up with the image it is searched in
+            search = self._gray(crop)
+            height, width = search.shape[:2]
+            x1, x2 = sorted(round(box[key] * TRACK_SCALE) for key in ('x1', 'x2'))
+            y1, y2 = sorted(round(box[key] * TRACK_SCALE) for key in ('y1', 'y2'))
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2), min(height, y2)
+            if x2 - x1 >= 4 and y2 - y1 >= 4:
+                template = search[y1:y2, x1:x2].copy()
+                position = (x1, y1)
+
+        with self._lock:
+            self._carried.discard(zone)
+            if template is None:
+                self._templates.pop(zone, None)
+                self._results.pop(zone, None)
+                self._positions.pop(zone, None)
+            else:
+                self._templates[zone] = template
+                self._results[zone] = result
+                self._positions[zone] = position
+
+    def track(self, zone, crop, match_threshold, max_shift, carry=False):
+        """Look for the zone's card template near its old box in the crop
+
+        The card counts as still there if the template matches with a score of
+        at least match_threshold, no further than max_shift times the card's
+        size from where it was detected. Returns the previous result of the
+        zone in that case, otherwise None. With carry, a zone whose card is
+        found is marked as carried until it is detected again (see carried).
+        """
+        with self._lock:
+            template = self._templates.get(zone)
+            result = self._results.get(zone)
+            position = self._positions.get(zone)
+        if template is None:
+            return None
+
+        search = self._gray(crop)
+        if search.shape[0] < template.shape[0] or search.shape[1] < template.shape[1]:
+            return None
+        _, score, _, location = cv2.minMaxLoc(cv2.matchTemplate(search, template, cv2.TM_CCOEFF_NORMED))
+        height, width = template.shape[:2]
+        shift = max(abs(location[0] - position[0]) / width, abs(location[1] - position[1]) / height)
+
+        with self._lock:
+            if score >= match_threshold and shift <= max_shift:
+                self._tracked += 1
+                if carry:
+                    self._carried.add(zone)
+                return result
+            self._lost += 1
+            return None
+
+    def carried(self, zone):
+        """Whether the zone's result was carried forward since it was last detected"""
+        with self._lock:
+            return zone in self._carried
+
+    def stabilize(self, hand, empty_after):
+        """Apply the empty-slot hysteresis to a per-zone hand
+
+        A detected card replaces the slot immediately; a slot is only reported
+        empty after empty_after consecutive empty observations.
+        """
+        with self._lock:
+            if len(self._stable) != len(hand):
+                self._stable = [None] * len(hand)
+                self._empty_runs = [0] * len(hand)
+
+            for i, card in enumerate(hand):
+                if card is not None:
+                    self._stable[i] = card
+                    self._empty_runs[i] = 0
+                else:
+                    self._empty_runs[i] += 1
+                    if self._empty_runs[i] >= empty_after:
+                        self._stable[i] = None
+            return list(self._stable)
+
+    def stats(self):
+        """Return keyframe and tracking counters"""
+        with self._lock:
+            return {
+                'frames': self._frame,
+                'keyframes': self._keyframes,
+                'tracked': self._tracked,
+                'lost': self._lost,
+            }
@@ -0,0 +1,116 @@
+import sys
+import time
+from threading import Condition, Thread
+
+
+class LatestFrameWorker:
+    """Run frame processing on a dedicated thread, latest frame wins.
+
+    Frames are handed over through a single slot: submitting a frame while
+    another one is still waiting replaces (drops) the waiting frame, so the
+    worker never spends time on frames that are already stale.
+    """
+
+    def __init__(self, process_frame, name='inference-worker'):
+        self._process_frame = process_frame
+        self._name = name
+        self._cond = Condition()
+        self._thread = None
+
+        self._next_seq = 0
+        self._pending = None        # (seq, frame) waiting for the worker
+        self._latest_seq = None     # seq of the last completed frame
+        self._latest_result = None  # result of the last completed frame
+        self._done_seq = 0          # highest seq that finished, failed or was superseded
+
+        self._submitted = 0
+        self._processed = 0
+        self._dropped = 0
+        self._errors = 0
+        self._last_error = None
+        self._error_seq = None      # seq of the last frame that failed
+        self._last_process_time = None
+
+    def start(self):
+        """Start the worker thread (no-op if already running)"""
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+
+    def submit(self, frame):
+        """Queue a frame for processing and return its sequence number
+
+        The worker thread is started on first use, so it only runs in the
+        process that actually serves requests.
+        """
+        self.start()
+        with self._cond:
+            self._next_seq += 1
+            if self._pending is not None:
+                self._dropped += 1
+            self._pending = (self._next_seq, frame)
+            self._submitted += 1
+            self._cond.notify_all()
+            return self._next_seq
+
+    def latest(self):
+        """Return (seq, result) of the most recent completed frame, or (None, None)"""
+        with self._cond:
+            return self._latest_seq, self._latest_result
+
+    def latest_error(self):
+        """Return (seq, message) of the most recent failed frame, or (None, None)"""
+        with self._cond:
+            return self._error_seq, self._last_error
+
+    def wait_for_result(self, seq, timeout=None):
+        """Block until frame seq (or a newer frame) is finished
+
+        Returns True if it finished, False on timeout.
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: self._done_seq >= seq, timeout)
+
+    def stats(self):
+        """Return queue depth and frame counters"""
+        with self._cond:
+            return {
+                'queue_depth': 0 if self._pending is None else 1,
+                'submitted': self._submitted,
+                'processed': self._processed,
+                'dropped': self._dropped,
+                'errors': self._errors,
+                'last_error': self._last_error,
+                'latest_seq': self._latest_seq,
+                'last_process_ms': self._last_process_time and round(self._last_process_time * 1000, 2),
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                seq, frame = self._pending
+                self._pending = None
+
+            start = time.perf_counter()
+            try:
+                result = self._process_frame(frame)
+            except Exception as e:
+                print(f"Error processing frame {seq}: {e}", file=sys.stderr)
+                with self._cond:
+                    self._errors += 1
+                    self._last_error = str(e)
+                    self._error_seq = seq
+                    self._done_seq = seq
+                    self._cond.notify_all()
+                continue
+
+            with self._cond:
+                self._latest_seq = seq
+                self._latest_result = result
+                self._done_seq = seq
+                self._processed += 1
+                self._last_process_time = time.perf_counter() - start
+                self._cond.notify_all()
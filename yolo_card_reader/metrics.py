@@ -0,0 +1,121 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock
+
+# Number of most recent observations per stage the percentiles are computed over
+DEFAULT_WINDOW = 1024
+
+# Percentiles reported for every stage
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+@contextmanager
+def stage_timer(timings, stage):
+    """Add the time spent in the with-block to timings[stage] (seconds)
+
+    timings may be None, in which case nothing is recorded.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+class LatencyMetrics:
+    """Rolling per-stage latency percentiles and event counters
+
+    Every processed frame contributes one observation per stage (decode,
+    split, detect, write...). Percentiles are computed over the last window
+    observations of each stage; counts and sums cover the process lifetime.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self._lock = Lock()
+        self._window = window
+        self._samples = {}  # stage -> recent durations in seconds
+        self._counts = {}   # stage -> number of observations
+        self._sums = {}     # stage -> total seconds
+        self._counters = {}
+
+    def reset(self):
+        """Forget all observations and counters"""
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._sums.clear()
+            self._counters.clear()
+
+    def observe(self, stage, seconds):
+        """Record one duration of a stage"""
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self._window)
+            self._samples[stage].append(seconds)
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+            self._sums[stage] = self._sums.get(stage, 0.0) + seconds
+
+    def record(self, timings):
+        """Record every stage of a timings dict filled by stage_timer"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+
+    def increment(self, counter, amount=1):
+        """Add amount to a counter"""
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    @staticmethod
+    def _quantile(ordered, q):
+        # Nearest-rank percentile of a sorted list
+        return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+    def snapshot(self):
+        """Return per-stage count, sum and percentiles (ms) and the counters"""
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+            sums = dict(self._sums)
+            counters = dict(self._counters)
+
+        stages = {}
+        for stage, ordered in samples.items():
+            stages[stage] = {
+                'count': counts[stage],
+                'sum_ms': round(sums[stage] * 1000, 2),
+                **{f"p{int(q * 100)}_ms": round(self._quantile(ordered, q) * 1000, 2) for q in QUANTILES},
+            }
+        return {'stages': stages, 'counters': counters}
+
+    def prometheus(self, prefix, extra_counters=None, gauges=None):
+        """Render the metrics in the Prometheus text exposition format
+
+        Stages become a summary named <prefix>_stage_seconds with a stage
+        label; counters become <prefix>_<name>_total. extra_counters and gauges
+        are {name: value} dicts from elsewhere (e.g. worker statistics).
+        """
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            counts = dict(self._counts)
+            sums = dict(self._sums)
+            counters = dict(self._counters)
+        counters.update(extra_counters or {})
+
+        name = f"{prefix}_stage_seconds"
+        lines = [f"# HELP {name} Frame processing time per stage over the last {self._window} frames",
+                 f"# TYPE {name} summary"]
+        for stage, ordered in samples.items():
+            for q in QUANTILES:
+                lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {self._quantile(ordered, q):.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {sums[stage]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {counts[stage]}')
+
+        for counter, value in counters.items():
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {value}")
+        for gauge, value in (gauges or {}).items():
+            lines.append(f"# TYPE {prefix}_{gauge} gauge")
+            lines.append(f"{prefix}_{gauge} {value}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,243 @@
+"""Run recorded frames through the card reader's detection pipeline offline
+
+Frames come from a directory of images, a glob pattern or a video file and go
+through the same pipeline as frames uploaded to the server (app.detect_hand
+with the detection settings of config.json, zone cache and tracker included).
+Reading and decoding, detection and writing run on their own threads,
+connected by bounded queues, so the next frames are decoded and earlier
+results written while the model works. One JSON line is written per frame
+(to stdout by default, which carries nothing else: logs and errors go to
+stderr); a throughput and latency summary is printed to stderr at the end.
+
+Usage:
+    python process_recording.py recordings/session1.mp4 -o session1.jsonl
+    python process_recording.py 'captures/*.jpg' --mode full_frame
+    python process_recording.py captures/ --stride 5 --limit 1000
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from queue import Full, Queue
+from threading import Event, Thread
+
+import cv2
+
+# app finds the YOLO repo, config.json and the weights relative to its own folder
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(APP_DIR, 'yolo11-poker-hand-detection-and-analysis-main'))
+import app
+from frame_decode import decode_frame
+from metrics import LatencyMetrics, stage_timer
+
+# Image files picked up from a directory
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+# Frames (or results) each stage may run ahead of the next one
+DEFAULT_QUEUE_SIZE = 8
+
+_END = object()
+
+
+def threaded(iterable, maxsize=DEFAULT_QUEUE_SIZE, name='stage'):
+    """Iterate over iterable on a background thread, at most maxsize items ahead of the consumer
+
+    Exceptions raised by the iterable are re-raised in the consumer. If the
+    consumer stops early, the thread stops at its next item.
+    """
+    queue = Queue(maxsize)
+    stopped = Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stopped.is_set():
+                    try:
+                        queue.put(item, timeout=0.1)
+                        break
+                    except Full:
+                        continue  # Check stopped again
+                if stopped.is_set():
+                    return
+            queue.put(_END)
+        except BaseException as e:
+            queue.put(e)
+
+    Thread(target=produce, name=name, daemon=True).start()
+    try:
+        while True:
+            item = queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stopped.set()
+
+
+def image_paths(source):
+    """Image files of a directory or glob pattern, sorted by name; None if source is a video file"""
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    elif glob.has_magic(source):
+        paths = glob.glob(source)
+    else:
+        return None
+    return sorted(path for path in paths if path.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def read_frames(source, num_zones, mode, reduced_decode=True, stride=1, limit=None):
+    """Yield decoded frames of a directory, glob pattern or video file as dicts
+
+    Image files are decoded like uploaded frames (at reduced resolution when
+    the model does not need the full one); every stride-th video frame is
+    decoded and the others are skipped without decoding. Each frame has its
+    'index', 'source' (path, or video path#frame number), 'image',
+    'decode_scale', 'decode' time and 'read_at' (perf_counter when reading
+    started).
+    """
+    paths = image_paths(source)
+    count = 0
+    if paths is not None:
+        for path in paths[::stride]:
+            if limit is not None and count >= limit:
+                return
+            read_at = time.perf_counter()
+            with open(path, 'rb') as f:
+                image, decode_scale = decode_frame(f.read(), num_zones, app.MODEL_IMGSZ, mode, reduced_decode)
+            if image is None:
+                print(f"Warning: could not decode {path}, skipped", file=sys.stderr)
+                continue
+            yield {'index': count, 'source': path, 'image': image, 'decode_scale': decode_scale,
+                   'decode': time.perf_counter() - read_at, 'read_at': read_at}
+            count += 1
+        return
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Could not open {source} as a video, directory or glob pattern")
+    try:
+        frame_number = 0
+        while limit is None or count < limit:
+            read_at = time.perf_counter()
+            if frame_number % stride:
+                if not capture.grab():
+                    return
+                frame_number += 1
+                continue
+            ok, image = capture.read()
+            if not ok:
+                return
+            yield {'index': count, 'source': f"{source}#{frame_number}",
+                   'timestamp_ms': round(capture.get(cv2.CAP_PROP_POS_MSEC), 1),
+                   'image': image, 'decode_scale': 1, 'decode': time.perf_counter() - read_at, 'read_at': read_at}
+            frame_number += 1
+            count += 1
+    finally:
+        capture.release()
+
+
+def detect_frames(frames, detection):
+    """Run frames through app.detect_hand one after another, yield one record per frame
+
+    The zone cache and tracker carry over from frame to frame like for a
+    table on the server.
+    """
+    zone_changes = app.ZoneChangeDetector()
+    hand_tracker = app.HandTracker()
+    for frame in frames:
+        timings = {'decode': frame['decode']}
+        results, card_presence, hand, keyframe = app.detect_hand(frame['image'], detection, zone_changes,
+                                                                 hand_tracker, timings)
+        record = {key: value for key, value in frame.items() if key not in ('image', 'decode', 'read_at')}
+        record.update({
+            'hand': hand.tuples(),
+            'card_presence': card_presence,
+            'results': results,
+            'keyframe': keyframe,
+            'timings': timings,
+        })
+        yield record, frame['read_at']
+
+
+def print_summary(metrics, frames, zones, elapsed, file=sys.stderr):
+    """Print throughput and per-stage latency percentiles"""
+    snapshot = metrics.snapshot()
+    counters = snapshot['counters']
+    print(f"{frames} frames, {zones} zones in {elapsed:.2f} s: "
+          f"{frames / elapsed if elapsed else 0:.1f} frames/s, {zones / elapsed if elapsed else 0:.1f} zones/s",
+          file=file)
+    print(f"Zones cached {counters.get('zones_cached', 0)}, tracked {counters.get('zones_tracked', 0)}", file=file)
+    print(f"{'stage':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'total s':>10}", file=file)
+    for stage, values in snapshot['stages'].items():
+        print(f"{stage:<14}{values['p50_ms']:>10}{values['p95_ms']:>10}{values['p99_ms']:>10}"
+              f"{values['sum_ms'] / 1000:>10.2f}", file=file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Detect cards in recorded frames and write JSON Lines results')
+    parser.add_argument('source', help='Directory of images, glob pattern (quoted) or video file')
+    parser.add_argument('-o', '--output', default='-', help='JSON Lines output file (default: stdout)')
+    parser.add_argument('--table', help='Use the detection settings of this table (tables.<id> in config.json)')
+    parser.add_argument('--mode', choices=('zones', 'full_frame'), help='Override detection.mode')
+    parser.add_argument('--num-zones', type=int, help='Override detection.num_cards')
+    parser.add_argument('--conf', type=float, help='Override detection.confidence_threshold')
+    parser.add_argument('--change-threshold', type=float,
+                        help='Override detection.change_threshold (0 detects every zone of every frame)')
+    parser.add_argument('--stride', type=int, default=1, help='Process every Nth frame or image')
+    parser.add_argument('--limit', type=int, help='Stop after this many frames')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='Frames each pipeline stage may run ahead of the next')
+    args = parser.parse_args()
+
+    source = os.path.abspath(args.source)
+    output = args.output if args.output == '-' else os.path.abspath(args.output)
+    os.chdir(APP_DIR)
+
+    # stdout only carries the JSON lines: prints (model loading, exports) and the
+    # Ultralytics logger, which writes to stdout, go to stderr instead
+    json_out = sys.stdout
+    sys.stdout = sys.stderr
+    for handler in logging.getLogger('ultralytics').handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream is json_out:
+            handler.setStream(sys.stderr)
+
+    app.load_config()
+    detection = app.table_detection_config(args.table)
+    overrides = {'mode': args.mode, 'num_cards': args.num_zones, 'confidence_threshold': args.conf,
+                 'change_threshold': args.change_threshold}
+    detection.update({key: value for key, value in overrides.items() if value is not None})
+    capture = {**app.CAPTURE_DEFAULTS, **app.config.get('capture', {})}
+    app.load_model()
+
+    # Reader -> detector -> writer (this thread), each stage at most queue_size frames ahead
+    frames = threaded(read_frames(source, detection['num_cards'], detection.get('mode', 'zones'),
+                                  capture['reduced_decode'], max(1, args.stride), args.limit),
+                      args.queue_size, name='read-frames')
+    records = threaded(detect_frames(frames, detection), args.queue_size, name='detect-frames')
+
+    metrics = LatencyMetrics(window=None)  # keep every observation for the summary
+    out = json_out if output == '-' else open(output, 'w')
+    frame_count = zone_count = 0
+    start = time.perf_counter()
+    try:
+        for record, read_at in records:
+            timings = record['timings']
+            record['timings'] = {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
+            with stage_timer(timings, 'write'):
+                out.write(json.dumps(record) + '\n')
+            # Time from reading the frame to its result being written, queueing included
+            timings['latency'] = time.perf_counter() - read_at
+            metrics.record(timings)
+            metrics.increment('zones_cached', sum(result['cached'] for result in record['results']))
+            metrics.increment('zones_tracked', sum(result['tracked'] for result in record['results']))
+            frame_count += 1
+            zone_count += len(record['results'])
+    finally:
+        if out is not json_out:
+            out.close()
+    print_summary(metrics, frame_count, zone_count, time.perf_counter() - start)
@@ -1,98 +1,883 @@
+import atexit
 import itertools
-from collections import Counter
+import json
+import math
+import mmap
+import os
+import random
+import struct
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
 
-# Define card ranks and suits
-RANKS = "23456789TJQKA"
-SUITS = "CDHS"
+# Card ranks and suits, and the card encoding, are shared with the detector and the card reader
+from cards import CARD_CODES, RANKS, SUITS, parse_card
 
 # Function to generate a deck
 def generate_deck():
-    return [rank + suit for rank in RANKS for suit in SUITS]
+    return list(CARD_CODES)
 
 # Function to determine poker hand ranking (simplified rules)
 def evaluate_hand(cards):
-    ranks = sorted([card[0] for card in cards], key=RANKS.index)
-    suits = [card[1] for card in cards]
+    '''Returns the hand categories made by cards, in any card format (see encode_cards).'''
+    return evaluate_hand_int(encode_cards(cards))
 
-    # How many times each rank appears 2, 3, 4, 5, 6, 7, 8, 9, 10, J, Q, K, A
-    rank_counts = Counter(ranks)
-    sorted_rank_freqs = sorted(rank_counts.values(), reverse=True) # Sums to 7
-    
-    # How many times each suit appears ♦, ♥, ♠, ♣
-    suit_counts = Counter(suits)
+# Integer card encoding (cards.py): card = rank_index * 4 + suit_index, in 0-51
+# e.g. '2C' = 0, '2D' = 1, ..., 'AS' = 51
+
+# Function to convert cards like 'KS' (or the detector's '10S', a 0-51 int or a (rank, suit)
+# tuple from the card reader, see cards.parse_card) to their integer encoding
+def encode_cards(cards):
+    return [parse_card(card) for card in cards]
 
-    is_flush = max(suit_counts.values()) >= 5
-    is_straight = any(
-        set(RANKS[i:i+5]).issubset(ranks) for i in range(len(RANKS) - 4)
-    )
+# Hand categories of evaluate_hand, as bits of a category code
+_STRAIGHT = 1
+_FLUSH = 2
+_ONE_PAIR = 4
+_TWO_PAIR = 8
+_THREE_OF_A_KIND = 16
+_FOUR_OF_A_KIND = 32
+_FULL_HOUSE = 64
 
+# Category code -> list of wins, in the same order evaluate_hand reports them
+def _wins_for_code(code):
     wins = []
-    
-    # check for a straight flush
-    if is_straight and is_flush:
+    if code & _STRAIGHT and code & _FLUSH:
         wins.append("Straight Flush")
-    
-    # Check for a flush
-    if is_flush:
+    if code & _FLUSH:
         wins.append("Flush")
-    
-    # Check for a straight
-    if is_straight:
+    if code & _STRAIGHT:
         wins.append("Straight")
-    
-    # Check for a one pair
-    if max(rank_counts.values()) >= 2:
+    if code & _ONE_PAIR:
         wins.append("One Pair")
-
-    # Check for a two pair
-    if (sorted_rank_freqs[0] >= 2 and sorted_rank_freqs[1] >= 2) or sorted_rank_freqs[0] >= 4:
+    if code & _TWO_PAIR:
         wins.append("Two Pair")
-    
-    if max(rank_counts.values()) >= 3:
+    if code & _THREE_OF_A_KIND:
         wins.append("Three of a Kind")
-
-    if max(rank_counts.values()) >= 4:
+    if code & _FOUR_OF_A_KIND:
         wins.append("Four of a Kind")
-    
-    if sorted_rank_freqs[0] >= 3 and sorted_rank_freqs[1] >= 2:
-        wins.append("Full House") 
-    
-    return wins
+    if code & _FULL_HOUSE:
+        wins.append("Full House")
+    return tuple(wins)
+
+WINS_TABLE = [_wins_for_code(code) for code in range(128)]
+_ALL_WINS = WINS_TABLE[-1]
+
+# 13-bit rank mask -> _STRAIGHT if it holds five consecutive ranks (2-6 up to T-A, as in evaluate_hand)
+STRAIGHT_TABLE = bytes(
+    _STRAIGHT if any((mask >> i) & 0b11111 == 0b11111 for i in range(len(RANKS) - 4)) else 0
+    for mask in range(1 << len(RANKS))
+)
+
+# Per-suit card counts are packed in 4-bit fields; adding 3 to every field sets
+# its top bit exactly when that suit holds 5 or more cards
+_SUIT_FIELDS = (1, 1 << 4, 1 << 8, 1 << 12)
+_FLUSH_BIAS = 0x3333
+_FLUSH_BITS = 0x8888
+
+# Card -> (rank bit, packed suit increment)
+_CARD_BITS = [(1 << (card >> 2), _SUIT_FIELDS[card & 3]) for card in range(52)]
+
+def _fold(cards, m1=0, m2=0, m3=0, m4=0, suits=0):
+    '''Adds cards to the rank multiplicity masks (ranks seen 1+, 2+, 3+, 4 times) and suit counts.'''
+    for card in cards:
+        b, s = _CARD_BITS[card]
+        m4 |= m3 & b
+        m3 |= m2 & b
+        m2 |= m1 & b
+        m1 |= b
+        suits += s
+    return m1, m2, m3, m4, suits
+
+def _category_code(m1, m2, m3, m4, suits):
+    code = STRAIGHT_TABLE[m1]
+    if (suits + _FLUSH_BIAS) & _FLUSH_BITS:
+        code |= _FLUSH
+    if m2:
+        code |= _ONE_PAIR
+        several_pairs = m2 & (m2 - 1)
+        if several_pairs or m4:
+            code |= _TWO_PAIR
+        if m3:
+            code |= _THREE_OF_A_KIND
+            if several_pairs:
+                code |= _FULL_HOUSE
+            if m4:
+                code |= _FOUR_OF_A_KIND
+    return code
+
+# Integer/bitmask version of evaluate_hand
+def evaluate_hand_int(cards):
+    '''Same as evaluate_hand, for integer-encoded cards (see encode_cards).'''
+    return list(WINS_TABLE[_category_code(*_fold(cards))])
+
+def _enumerate_codes(state, remaining, start, k, counts, order):
+    '''
+    Counts the category code of every k-card completion of remaining[start:].
+
+    The masks of the cards chosen so far are carried down the recursion, so each
+    level only folds in one card. New codes are appended to order when first seen.
+    '''
+    m1, m2, m3, m4, suits = state
+    if k == 0:
+        code = _category_code(m1, m2, m3, m4, suits)
+        if not counts[code]:
+            order.append(code)
+        counts[code] += 1
+        return
+
+    straight_table = STRAIGHT_TABLE
+    if k == 1:
+        for b, s in remaining[start:]:
+            n2 = m2 | (m1 & b)
+            n3 = m3 | (m2 & b)
+            n4 = m4 | (m3 & b)
+            code = straight_table[m1 | b]
+            if (suits + s + _FLUSH_BIAS) & _FLUSH_BITS:
+                code |= _FLUSH
+            if n2:
+                code |= _ONE_PAIR
+                several_pairs = n2 & (n2 - 1)
+                if several_pairs or n4:
+                    code |= _TWO_PAIR
+                if n3:
+                    code |= _THREE_OF_A_KIND
+                    if several_pairs:
+                        code |= _FULL_HOUSE
+                    if n4:
+                        code |= _FOUR_OF_A_KIND
+            if not counts[code]:
+                order.append(code)
+            counts[code] += 1
+        return
+
+    for i in range(start, len(remaining) - k + 1):
+        b, s = remaining[i]
+        state = (m1 | b, m2 | (m1 & b), m3 | (m2 & b), m4 | (m3 & b), suits + s)
+        _enumerate_codes(state, remaining, i + 1, k - 1, counts, order)
+
+def _win_counts(counts, order):
+    '''Expands category code counts into a Counter of wins.'''
+    # Wins are inserted in order of first appearance, exactly like the Counter in evaluate_hand's loop
+    outcomes = Counter()
+    for code in order:
+        for win in WINS_TABLE[code]:
+            outcomes[win] += counts[code]
+    return outcomes
+
+def _probabilities(counts, order):
+    '''Converts category code counts to the probability dict returned by analyze_hand.'''
+    outcomes = _win_counts(counts, order)
+    total_cases = sum(counts)
+
+    # Convert counts to probabilities
+    probabilities = {rank: count / total_cases for rank, count in outcomes.items()}
+
+    # Sort probabilities by value in descending order
+    sorted_probabilities = dict(sorted(probabilities.items(), key=lambda item: item[1], reverse=True))
+    return sorted_probabilities
+
+# Lookup tables for the NumPy engine, built on first use
+_np_tables = None
+
+def _numpy_tables():
+    global _np_tables
+    if _np_tables is None:
+        import numpy as np
+        rank_bits = np.array([b for b, _ in _CARD_BITS], dtype=np.int32)
+        suit_fields = np.array([s for _, s in _CARD_BITS], dtype=np.int32)
+        straight = np.frombuffer(STRAIGHT_TABLE, dtype=np.uint8).astype(np.int32)
+        _np_tables = (rank_bits, suit_fields, straight)
+    return _np_tables
+
+def _fold_numpy(cards):
+    '''Vectorized _fold: multiplicity masks and suit counts for each row of a (rows, j) card array.'''
+    import numpy as np
+    rank_bits, suit_fields, _ = _numpy_tables()
+    rows = len(cards)
+    m1, m2, m3, m4, suits = (np.zeros(rows, dtype=np.int32) for _ in range(5))
+    for column in cards.T:
+        b = rank_bits[column]
+        m4 |= m3 & b
+        m3 |= m2 & b
+        m2 |= m1 & b
+        m1 |= b
+        suits += suit_fields[column]
+    return m1, m2, m3, m4, suits
+
+def _combine_codes_numpy(state, tails):
+    '''
+    Category codes of the scalar fold state combined with each row of folded tails.
+
+    Ranks seen at least t times in the union are those seen i times in one
+    part and t - i times in the other, for some i.
+    '''
+    a1, a2, a3, a4, a_suits = state
+    b1, b2, b3, b4, b_suits = tails
+    _, _, straight = _numpy_tables()
+
+    m1 = b1 | a1
+    m2 = b2 | a2 | (b1 & a1)
+    m3 = b3 | a3 | (b2 & a1) | (b1 & a2)
+    m4 = b4 | a4 | (b3 & a1) | (b2 & a2) | (b1 & a3)
+
+    code = straight[m1]
+    code |= (((b_suits + (a_suits + _FLUSH_BIAS)) & _FLUSH_BITS) != 0) * _FLUSH
+    several_pairs = (m2 & (m2 - 1)) != 0
+    has_trips = m3 != 0
+    has_quads = m4 != 0
+    code |= (m2 != 0) * _ONE_PAIR
+    code |= (several_pairs | has_quads) * _TWO_PAIR
+    code |= has_trips * _THREE_OF_A_KIND
+    code |= has_quads * _FOUR_OF_A_KIND
+    code |= (has_trips & several_pairs) * _FULL_HOUSE
+    return code
+
+def _count_codes_numpy(known, remaining, k, chunk_size=65536):
+    '''
+    Vectorized version of _enumerate_codes over all k-card completions of remaining.
+
+    Combinations are produced in lexicographic order, one first card at a time.
+    The (k-1)-card tails of first card i are the suffix of one precomputed tail
+    matrix whose first index is above i, and their masks are folded once up
+    front. Each first card then only combines its scalar state with that suffix,
+    in chunks of at most chunk_size rows, so memory stays bounded even preflop.
+    '''
+    import numpy as np
+    counts = np.zeros(len(WINS_TABLE), dtype=np.int64)
+    order = []
+
+    def count(code):
+        chunk_counts = np.bincount(code, minlength=len(WINS_TABLE))
+        new_codes = np.flatnonzero((chunk_counts > 0) & (counts == 0))
+        if len(new_codes):
+            # Record new codes in order of first appearance, like the scalar engine
+            first_seen = [np.argmax(code == c) for c in new_codes]
+            order.extend(int(c) for _, c in sorted(zip(first_seen, new_codes)))
+        counts[:] += chunk_counts
+
+    known_state = _fold(known)
+    if k == 0:
+        count(np.array([_category_code(*known_state)]))
+        return counts.tolist(), order
+
+    remaining = np.asarray(remaining, dtype=np.intp)
+    n = len(remaining)
+    if k == 1:
+        tail_index = np.empty((1, 0), dtype=np.intp)
+    else:
+        tail_index = np.fromiter(itertools.chain.from_iterable(itertools.combinations(range(n), k - 1)),
+                                 dtype=np.intp).reshape(-1, k - 1)
+    tails = _fold_numpy(remaining[tail_index])
+
+    for first in range(n - k + 1):
+        state = _fold([remaining[first]], *known_state)
+        start = 0 if k == 1 else np.searchsorted(tail_index[:, 0], first + 1)
+        for chunk_start in range(start, len(tail_index), chunk_size):
+            chunk = slice(chunk_start, chunk_start + chunk_size)
+            count(_combine_codes_numpy(state, [part[chunk] for part in tails]))
+
+    return counts.tolist(), order
+
+# Process pool for method='parallel', created on first use and reused across calls
+_pool = None
+_pool_workers = None
+_pool_lock = Lock()
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown()
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+def shutdown_pool():
+    '''Stops the worker processes used by method='parallel'.'''
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+            _pool_workers = None
+
+atexit.register(shutdown_pool)
+
+def _count_partition(known, remaining, first, k):
+    '''
+    Counts the category codes of the k-card completions whose first card is remaining[first].
+
+    Runs in a worker process. Returns a Counter of codes, in order of first appearance.
+    '''
+    counts = [0] * len(WINS_TABLE)
+    order = []
+    state = _fold([remaining[first]] + list(known))
+    _enumerate_codes(state, [_CARD_BITS[card] for card in remaining], first + 1, k - 1, counts, order)
+    return Counter({code: counts[code] for code in order})
+
+def _count_codes_parallel(known, remaining, k, workers=None):
+    '''
+    Parallel version of _enumerate_codes, partitioned by the first extra card.
+
+    Partitions are merged in order of their first card, which is the scalar
+    enumeration order, so the merged counts and first-appearance order are
+    identical to the serial path.
+    '''
+    workers = workers or os.cpu_count() or 1
+    if k == 0 or workers == 1:
+        counts = [0] * len(WINS_TABLE)
+        order = []
+        _enumerate_codes(_fold(known), [_CARD_BITS[card] for card in remaining], 0, k, counts, order)
+        return counts, order
+
+    firsts = range(len(remaining) - k + 1)
+    partials = _get_pool(workers).map(_count_partition, itertools.repeat(known), itertools.repeat(remaining),
+                                      firsts, itertools.repeat(k))
+    merged = Counter()
+    for partial in partials:
+        merged.update(partial)
+
+    counts = [0] * len(WINS_TABLE)
+    for code, count in merged.items():
+        counts[code] = count
+    return counts, list(merged)
+
+# All 24 relabellings of the four suits
+_SUIT_PERMUTATIONS = list(itertools.permutations(range(len(SUITS))))
+
+def canonical_key(table_cards, hand_cards):
+    '''Returns a key shared by every state that is the same up to suit relabelling and card order.
+
+    analyze_hand only depends on the set of known cards and on how many table
+    cards are still to come, and hand categories do not depend on which suit is
+    which, so the key is the smallest sorted encoding over all suit relabellings.
+
+    Args:
+        table_cards (list): List of cards on the table. e.g. ['2C', '7H', '9D']
+        hand_cards (list): List of cards on the player's hand. e.g. ['KS', '7D']
+
+    Returns:
+        tuple: (number of table cards, tuple of encoded cards)
+    '''
+    return len(table_cards), canonical_cards(encode_cards(list(table_cards) + list(hand_cards)))
+
+def canonical_cards(cards):
+    '''Returns the smallest sorted tuple of encoded cards over all suit relabellings.'''
+    return min(tuple(sorted((card & ~3) | permutation[card & 3] for card in cards))
+               for permutation in _SUIT_PERMUTATIONS)
+
+class AnalysisCache:
+    '''Bounded LRU cache of analyze_hand results keyed by canonical_key.
+
+    Args:
+        maxsize (int): Maximum number of cached states. Default is 4096.
+        path (str): Optional JSON file the cache is loaded from and saved to at exit. Default is None.
+    '''
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        if path is not None:
+            if os.path.exists(path):
+                self.load()
+            atexit.register(self.save)
+
+    def get(self, key):
+        '''Returns a copy of the cached probabilities for key, or None.'''
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+
+    def put(self, key, probabilities):
+        with self._lock:
+            self._entries[key] = dict(probabilities)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        '''Returns hit/miss counts and the current size.'''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries), 'maxsize': self.maxsize}
+
+    def save(self, path=None):
+        '''Writes the cache to a JSON file (atomically, via a temporary file).'''
+        path = path or self.path
+        if path is None:
+            return
+        with self._lock:
+            entries = [[table_count, list(cards), probabilities]
+                       for (table_count, cards), probabilities in self._entries.items()]
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(temp_path, path)
+
+    def load(self, path=None):
+        '''Loads entries from a JSON file written by save, keeping the most recent maxsize.'''
+        with open(path or self.path, 'r') as f:
+            entries = json.load(f)
+        for table_count, cards, probabilities in entries:
+            self.put((table_count, tuple(cards)), probabilities)
+
+# Cache used by analyze_hand unless told otherwise
+default_cache = AnalysisCache()
+
+# Precomputed probability table file (see build_tables.py):
+#   header:  magic, version, number of categories, rows, hash slots, length of the category JSON
+#   then:    category names as JSON (padded to 8 bytes)
+#   slots:   (u64 packed key, u32 row) per slot, open addressing with linear probing, key 0 = empty
+#   rows:    u32 count per category followed by the u32 number of combinations
+TABLE_MAGIC = b'PHTB'
+TABLE_VERSION = 1
+TABLE_HEADER = struct.Struct('<4sIIIII')
+TABLE_SLOT = struct.Struct('<QI4x')
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tables', 'hand_probabilities.bin')
+
+def pack_key(key):
+    '''Packs a canonical_key into a non-zero 64-bit integer.'''
+    table_count, cards = key
+    packed = 0
+    for i, card in enumerate(cards):
+        packed |= card << (6 * i)
+    return (len(cards) << 52) | ((table_count + 1) << 48) | packed
+
+def table_slot(packed_key, slot_bits):
+    '''First hash slot of a packed key (Fibonacci hashing).'''
+    return ((packed_key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> (64 - slot_bits)
+
+class ProbabilityTable:
+    '''Memory-mapped, read-only table of precomputed analyze_hand results.
+
+    Args:
+        path (str): Table file written by build_tables.py.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, num_categories, self.rows, self.slots, names_length = TABLE_HEADER.unpack_from(self._map, 0)
+        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+            raise ValueError(f"{path} is not a version {TABLE_VERSION} probability table")
+        names_offset = TABLE_HEADER.size
+        self.categories = json.loads(self._map[names_offset:names_offset + names_length])
+        self._slots_offset = names_offset + (names_length + 7) // 8 * 8
+        self._rows_offset = self._slots_offset + self.slots * TABLE_SLOT.size
+        self._row = struct.Struct(f'<{num_categories + 1}I')
+        self._slot_bits = self.slots.bit_length() - 1
+
+    def lookup(self, key):
+        '''Returns the probability dict for a canonical_key, or None if the table does not cover it.'''
+        packed = pack_key(key)
+        slot = table_slot(packed, self._slot_bits)
+        while True:
+            slot_key, row = TABLE_SLOT.unpack_from(self._map, self._slots_offset + slot * TABLE_SLOT.size)
+            if slot_key == packed:
+                break
+            if slot_key == 0:
+                return None
+            slot = (slot + 1) & (self.slots - 1)
+
+        *counts, total_cases = self._row.unpack_from(self._map, self._rows_offset + row * self._row.size)
+        probabilities = {win: count / total_cases for win, count in zip(self.categories, counts) if count}
+
+        # Sort probabilities by value in descending order
+        return dict(sorted(probabilities.items(), key=lambda item: item[1], reverse=True))
+
+    def close(self):
+        self._map.close()
+
+# Table used by analyze_hand, loaded from DEFAULT_TABLE_PATH on first use if it exists
+_default_table = None
+_default_table_loaded = False
+_table_lock = Lock()
+
+def load_table(path=None):
+    '''Returns the default ProbabilityTable, or opens the table at path.
+
+    Returns None when the default table file has not been built.
+    '''
+    global _default_table, _default_table_loaded
+    if path is not None:
+        return ProbabilityTable(path)
+    with _table_lock:
+        if not _default_table_loaded:
+            if os.path.exists(DEFAULT_TABLE_PATH):
+                _default_table = ProbabilityTable(DEFAULT_TABLE_PATH)
+            _default_table_loaded = True
+        return _default_table
+
+def _split_deck(table_cards, hand_cards):
+    '''Returns the encoded known cards, the encoded remaining deck and the number of cards still to come.'''
+    # Remove known cards from the deck (as ints, so every card format works)
+    known = encode_cards(list(table_cards) + list(hand_cards))
+    known_cards = set(known)
+    remaining_deck = [card for card in range(len(CARD_CODES)) if card not in known_cards]
+    extra = 5 - len(table_cards)
+    if extra < 0:
+        raise ValueError(f"At most 5 table cards are allowed, got {len(table_cards)}")
+    return known, remaining_deck, extra
 
 # Analyze probabilities
-def analyze_hand(table_cards, hand_cards):
+def analyze_hand(table_cards, hand_cards, method='python', chunk_size=65536, workers=None, cache=True,
+                 table=True, **options):
     '''Analyze the probabilities of winning poker hands.
 
     Args:
         table_cards (list): List of cards on the table (at most of length 5). e.g. ['2C', '7H', '9D'] 
         player_cards (list): List of cards on the player's hand (always of length 2). e.g. ['KS', '7D]
+            Cards may also be given as '10D', 0-51 ints or (rank, suit) tuples (see cards.parse_card).
+        method (str): 'python' enumerates combinations one by one, 'numpy' classifies them in
+            vectorized chunks, 'parallel' splits the enumeration over a process pool. All three
+            return the same probabilities. 'monte_carlo' estimates them from random samples
+            (see analyze_hand_monte_carlo). Default is 'python'.
+        chunk_size (int): Maximum combinations per chunk for method='numpy'. Default is 65536.
+        workers (int): Worker processes for method='parallel'. The pool is kept and reused by
+            later calls with the same count. Default is None (one per CPU).
+        cache (bool or AnalysisCache): Look up and store exact results in an AnalysisCache, shared by
+            suit-isomorphic states. True uses default_cache, False disables caching. Default is True.
+        table (bool or ProbabilityTable): Look exact results up in a precomputed table first (see
+            build_tables.py). True uses tables/hand_probabilities.bin if it exists. Default is True.
+        options: Extra arguments for method='monte_carlo' (time_budget, target_error, max_samples, seed).
     
     Returns:
         dict: Dictionary of probabilities of winning poker hands.
     '''
-    # Generate deck and remove known cards
-    deck = generate_deck()
-    known_cards = set(table_cards + hand_cards)
-    remaining_deck = [card for card in deck if card not in known_cards]
+    if method == 'monte_carlo':
+        return analyze_hand_monte_carlo(table_cards, hand_cards, **options)['probabilities']
 
-    # Combine table cards and hand cards
-    all_known_cards = table_cards + hand_cards
+    if table is True:
+        table = load_table()
+    if cache is True:
+        cache = default_cache
+    if table or cache:
+        key = canonical_key(table_cards, hand_cards)
+    if table:
+        probabilities = table.lookup(key)
+        if probabilities is not None:
+            return probabilities
+    if cache:
+        probabilities = cache.get(key)
+        if probabilities is not None:
+            return probabilities
 
-    # Simulate possible outcomes
-    outcomes = Counter()
-    total_cases = 0
+    known, remaining, extra = _split_deck(table_cards, hand_cards)
 
-    # Iterate over all possible combinations of remaining cards
-    for extra_cards in itertools.combinations(remaining_deck, 5 - len(table_cards)):
-        full_hand = all_known_cards + list(extra_cards)
-        wins = evaluate_hand(full_hand)
-        for win in wins:
-            outcomes[win] += 1
-        total_cases += 1
+    # Count the category code of all possible combinations of remaining cards
+    if method == 'numpy':
+        counts, order = _count_codes_numpy(known, remaining, extra, chunk_size)
+    elif method == 'parallel':
+        counts, order = _count_codes_parallel(known, remaining, extra, workers)
+    elif method == 'python':
+        # Fold the known cards once; every combination only adds the extra cards
+        counts = [0] * len(WINS_TABLE)
+        order = []
+        _enumerate_codes(_fold(known), [_CARD_BITS[card] for card in remaining], 0, extra, counts, order)
+    else:
+        raise ValueError(f"Unknown method '{method}', expected 'python', 'numpy', 'parallel' or 'monte_carlo'")
 
-    # Convert counts to probabilities
-    probabilities = {rank: count / total_cases for rank, count in outcomes.items()}
+    probabilities = _probabilities(counts, order)
+    if cache:
+        cache.put(key, probabilities)
+    return probabilities
 
-    # Sort probabilities by value in descending order
-    sorted_probabilities = dict(sorted(probabilities.items(), key=lambda item: item[1], reverse=True))
-    return sorted_probabilities
+# z value of a 95% confidence interval
+_Z_95 = 1.959964
+
+def _wilson_interval(successes, samples, z=_Z_95):
+    '''Wilson score interval of a binomial proportion.'''
+    p = successes / samples
+    denominator = 1 + z * z / samples
+    center = (p + z * z / (2 * samples)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / samples + z * z / (4 * samples * samples)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+# Estimate probabilities by sampling
+# Wall-clock budget of analyze_hand_monte_carlo when no other stopping rule is given
+DEFAULT_TIME_BUDGET = 0.05
+
+# time_budget not passed: DEFAULT_TIME_BUDGET unless target_error or max_samples is given
+_DEFAULT_BUDGET = object()
+
+def analyze_hand_monte_carlo(table_cards, hand_cards, time_budget=_DEFAULT_BUDGET, target_error=None,
+                             max_samples=None, seed=None, batch_size=256):
+    '''Estimate the probabilities of winning poker hands from random board completions.
+
+    Sampling runs in batches until the wall-clock budget is spent, the target
+    precision is reached or max_samples is drawn, whichever comes first. At
+    least one of the three must be set. States
+    with no more completions than one batch (turn and river) are enumerated
+    exactly instead.
+
+    Args:
+        table_cards (list): List of cards on the table (at most of length 5). e.g. ['2C', '7H', '9D']
+        player_cards (list): List of cards on the player's hand (always of length 2). e.g. ['KS', '7D]
+        time_budget (float): Wall-clock budget in seconds, None for no budget. Default is
+            DEFAULT_TIME_BUDGET (0.05) if neither target_error nor max_samples is given, else None.
+        target_error (float): Stop once the standard error of every category is at most this. Default is None.
+        max_samples (int): Maximum number of samples, at least 1. Default is None (no limit).
+        seed (int): Seed of the random number generator, for reproducible estimates. Default is None.
+        batch_size (int): Samples drawn between two stopping checks. Default is 256.
+
+    Returns:
+        dict: 'probabilities' (sorted like analyze_hand), 'stderr' and 'ci95' (Wilson interval)
+            per category, the number of 'samples', the 'elapsed' seconds and whether the result is 'exact'.
+    '''
+    start_time = time.perf_counter()
+    if time_budget is _DEFAULT_BUDGET:
+        time_budget = DEFAULT_TIME_BUDGET if target_error is None and max_samples is None else None
+    if time_budget is None and target_error is None and max_samples is None:
+        raise ValueError("Sampling needs a stopping rule: time_budget, target_error or max_samples")
+    if max_samples is not None and max_samples < 1:
+        raise ValueError(f"max_samples must be at least 1, got {max_samples}")
+    known, remaining, extra = _split_deck(table_cards, hand_cards)
+    state = _fold(known)
+    counts = [0] * len(WINS_TABLE)
+    order = []
+
+    exact = math.comb(len(remaining), extra) <= batch_size
+    if exact:
+        _enumerate_codes(state, [_CARD_BITS[card] for card in remaining], 0, extra, counts, order)
+    else:
+        rng = random.Random(seed)
+        samples = 0
+        while True:
+            batch = batch_size if max_samples is None else min(batch_size, max_samples - samples)
+            for _ in range(batch):
+                code = _category_code(*_fold(rng.sample(remaining, extra), *state))
+                if not counts[code]:
+                    order.append(code)
+                counts[code] += 1
+            samples += batch
+
+            if max_samples is not None and samples >= max_samples:
+                break
+            if time_budget is not None and time.perf_counter() - start_time >= time_budget:
+                break
+            if target_error is not None:
+                # Smoothed proportions, so categories not seen yet do not look exact
+                outcomes = _win_counts(counts, order)
+                worst = max(((outcomes.get(win, 0) + 1) / (samples + 2) for win in _ALL_WINS),
+                            key=lambda p: p * (1 - p))
+                if math.sqrt(worst * (1 - worst) / samples) <= target_error:
+                    break
+
+    samples = sum(counts)
+    outcomes = _win_counts(counts, order)
+    probabilities = _probabilities(counts, order)
+    stderr = {}
+    ci95 = {}
+    for win, p in probabilities.items():
+        stderr[win] = 0.0 if exact else math.sqrt(p * (1 - p) / samples)
+        ci95[win] = (p, p) if exact else _wilson_interval(outcomes[win], samples)
+
+    return {
+        'probabilities': probabilities,
+        'stderr': stderr,
+        'ci95': ci95,
+        'samples': samples,
+        'elapsed': time.perf_counter() - start_time,
+        'exact': exact,
+    }
+
+# Full hand strength for equity: category << 26 | primary ranks << 13 | kicker ranks,
+# where rank groups are 13-bit masks, so comparing scores compares hands with kickers
+_HIGH_CARD, _PAIR, _TWO_PAIRS, _TRIPS, _STRAIGHT_RANK, _FLUSH_RANK, _FULL_HOUSE_RANK, _QUADS, _STRAIGHT_FLUSH = range(9)
+
+# Lookup tables for equity, built on first use
+_equity_tables = None
+
+def _equity_numpy_tables():
+    '''(popcount, straight high card bit, top-k bits) tables indexed by 13-bit rank mask.'''
+    global _equity_tables
+    if _equity_tables is None:
+        import numpy as np
+        masks = range(1 << len(RANKS))
+        popcount = np.array([bin(mask).count('1') for mask in masks], dtype=np.int64)
+        straight = np.zeros(1 << len(RANKS), dtype=np.int64)
+        top = np.zeros((6, 1 << len(RANKS)), dtype=np.int64)
+        for mask in masks:
+            # Highest five consecutive ranks, the wheel (A-2-3-4-5) counting as five-high
+            low_ace = mask << 1 | mask >> (len(RANKS) - 1)
+            for high in range(len(RANKS), 3, -1):
+                if (low_ace >> (high - 4)) & 0b11111 == 0b11111:
+                    straight[mask] = 1 << (high - 1)
+                    break
+            kept = 0
+            for k in range(1, 6):
+                rest = mask & ~kept
+                if rest:
+                    kept |= 1 << (rest.bit_length() - 1)
+                top[k, mask] = kept
+        _equity_tables = (popcount, straight, top)
+    return _equity_tables
+
+def _fold_suits_numpy(cards, m1, m2, m3, m4, suit_masks):
+    '''Adds the columns of a card array to rank multiplicity masks and per-suit rank masks (new arrays).'''
+    import numpy as np
+    m1, m2, m3, m4 = m1.copy(), m2.copy(), m3.copy(), m4.copy()
+    suit_masks = suit_masks.copy()
+    rows = np.arange(len(cards))
+    for column in cards.T:
+        b = np.left_shift(1, column >> 2)
+        m4 |= m3 & b
+        m3 |= m2 & b
+        m2 |= m1 & b
+        m1 |= b
+        suit_masks[rows, column & 3] |= b
+    return m1, m2, m3, m4, suit_masks
+
+def _hand_scores_numpy(m1, m2, m3, m4, suit_masks):
+    '''Comparable strength of the best five-card hand for each row of folded seven-card hands.'''
+    import numpy as np
+    popcount, straight, top = _equity_numpy_tables()
+
+    def score(category, primary, kickers=0):
+        return (category << 26) | (primary << 13) | kickers
+
+    flush = suit_masks.max(axis=1, initial=0, where=popcount[suit_masks] >= 5)
+    pairs = top[2][m2]
+    trips = top[1][m3]
+    full_house_pair = top[1][m2 & ~trips]
+
+    # Weakest category first, each stronger one overrides
+    scores = score(_HIGH_CARD, top[5][m1])
+    scores = np.where(m2 != 0, score(_PAIR, m2, top[3][m1 & ~m2]), scores)
+    scores = np.where(popcount[m2] >= 2, score(_TWO_PAIRS, pairs, top[1][m1 & ~pairs]), scores)
+    scores = np.where(m3 != 0, score(_TRIPS, trips, top[2][m1 & ~trips]), scores)
+    scores = np.where(straight[m1] != 0, score(_STRAIGHT_RANK, straight[m1]), scores)
+    scores = np.where(flush != 0, score(_FLUSH_RANK, top[5][flush]), scores)
+    scores = np.where((m3 != 0) & (full_house_pair != 0), score(_FULL_HOUSE_RANK, trips, full_house_pair), scores)
+    scores = np.where(m4 != 0, score(_QUADS, m4, top[1][m1 & ~m4]), scores)
+    return np.where(straight[flush] != 0, score(_STRAIGHT_FLUSH, straight[flush]), scores)
+
+def _showdown_numpy(board_state, hand, deals, extra, num_opponents):
+    '''(wins, ties, losses, equity share) summed over deals: extra board cards then two cards per opponent.'''
+    import numpy as np
+    board = _fold_suits_numpy(deals[:, :extra], *(np.repeat(part[None], len(deals), axis=0) for part in board_state))
+    hero = _hand_scores_numpy(*_fold_suits_numpy(np.broadcast_to(hand, (len(deals), 2)), *board))
+    best = np.zeros(len(deals), dtype=np.int64)
+    tied = np.zeros(len(deals), dtype=np.int64)
+    for i in range(num_opponents):
+        opponent = _hand_scores_numpy(*_fold_suits_numpy(deals[:, extra + 2 * i:extra + 2 * i + 2], *board))
+        best = np.maximum(best, opponent)
+        tied += opponent == hero
+    wins = hero > best
+    ties = hero == best
+    share = wins.sum() + (ties / (tied + 1)).sum()
+    return int(wins.sum()), int(ties.sum()), int(len(deals) - wins.sum() - ties.sum()), float(share)
+
+def _deal_count(remaining, extra, num_opponents):
+    '''Number of distinct deals of the board and the opponents' hands.'''
+    count = math.comb(remaining, extra)
+    for i in range(num_opponents):
+        count *= math.comb(remaining - extra - 2 * i, 2)
+    return count
+
+def _all_deals(remaining, extra, num_opponents):
+    '''Yields every deal as a tuple: extra board cards, then two cards per opponent.'''
+    def deal(cards, players):
+        if not players:
+            yield ()
+            return
+        for hand in itertools.combinations(cards, 2):
+            rest = [card for card in cards if card not in hand]
+            for others in deal(rest, players - 1):
+                yield hand + others
+
+    for board in itertools.combinations(remaining, extra):
+        rest = [card for card in remaining if card not in board]
+        for hands in deal(rest, num_opponents):
+            yield board + hands
+
+# Win/tie/loss against random opponents
+def equity(hand_cards, table_cards=(), num_opponents=1, samples=20000, time_budget=None,
+           exact_limit=20000, seed=None, batch_size=4096):
+    '''Estimate how often the player's hand wins against random opponent hands at showdown.
+
+    Hands are compared with full poker rankings (kickers, A-2-3-4-5 straights).
+    When there are at most exact_limit possible deals (e.g. the river against a
+    single opponent) they are all enumerated; otherwise deals are sampled in
+    vectorized batches.
+
+    Args:
+        hand_cards (list): List of cards on the player's hand (always of length 2). e.g. ['KS', '7D']
+        table_cards (list): List of cards on the table (at most of length 5). e.g. ['2C', '7H', '9D']
+        num_opponents (int): Number of opponents, each holding two random cards. Default is 1.
+        samples (int): Number of sampled deals when not enumerating. Default is 20000.
+        time_budget (float): Stop sampling after this many seconds, even before samples. Default is None.
+        exact_limit (int): Enumerate exactly when there are at most this many deals. Default is 20000.
+        seed (int): Seed of the random number generator, for reproducible estimates. Default is None.
+        batch_size (int): Deals evaluated per vectorized batch. Default is 4096.
+
+    Returns:
+        dict: 'win' (beats every opponent), 'tie' (splits the pot) and 'loss' probabilities, the
+            'equity' (expected share of the pot), the number of 'samples', the 'elapsed' seconds
+            and whether the result is 'exact'.
+    '''
+    import numpy as np
+    start_time = time.perf_counter()
+    known, remaining, extra = _split_deck(list(table_cards), list(hand_cards))
+    if num_opponents < 1:
+        raise ValueError(f"At least one opponent is required, got {num_opponents}")
+    if extra + 2 * num_opponents > len(remaining):
+        raise ValueError(f"Not enough cards left for {num_opponents} opponents")
+
+    table = np.array(known[:len(known) - 2], dtype=np.int64).reshape(1, -1)
+    hand = np.array(known[len(known) - 2:], dtype=np.int64)
+    empty = (np.zeros(1, dtype=np.int64),) * 4 + (np.zeros((1, len(SUITS)), dtype=np.int64),)
+    board_state = tuple(part[0] for part in _fold_suits_numpy(table, *empty))
+
+    totals = [0, 0, 0, 0.0]
+    exact = _deal_count(len(remaining), extra, num_opponents) <= exact_limit
+    if exact:
+        deals = np.array(list(_all_deals(remaining, extra, num_opponents)), dtype=np.int64)
+        deals = deals.reshape(len(deals), extra + 2 * num_opponents)
+        for offset in range(0, len(deals), batch_size):
+            result = _showdown_numpy(board_state, hand, deals[offset:offset + batch_size], extra, num_opponents)
+            totals = [total + part for total, part in zip(totals, result)]
+    else:
+        rng = np.random.default_rng(seed)
+        deck = np.array(remaining, dtype=np.int64)
+        needed = extra + 2 * num_opponents
+        dealt = 0
+        while dealt < samples:
+            batch = min(batch_size, samples - dealt)
+            # First cards of a random permutation of the remaining deck, per row
+            deals = deck[rng.random((batch, len(deck))).argsort(axis=1)[:, :needed]]
+            result = _showdown_numpy(board_state, hand, deals, extra, num_opponents)
+            totals = [total + part for total, part in zip(totals, result)]
+            dealt += batch
+            if time_budget is not None and time.perf_counter() - start_time >= time_budget:
+                break
+
+    wins, ties, losses, share = totals
+    total = wins + ties + losses
+    return {
+        'win': wins / total,
+        'tie': ties / total,
+        'loss': losses / total,
+        'equity': share / total,
+        'samples': total,
+        'elapsed': time.perf_counter() - start_time,
+        'exact': exact,
+    }
@@ -0,0 +1,94 @@
+'''Builds the precomputed probability table that analyze_hand memory-maps.
+
+Every canonical state (see analyze_hand.canonical_key) is enumerated exactly
+and its category counts are written to a compact binary table. analyze_hand
+looks states up in it in O(1) and computes anything else live.
+
+Usage:
+    python build_tables.py                 # the 169 canonical preflop states
+    python build_tables.py --flop          # plus every canonical flop state (slow)
+    python build_tables.py --output other.bin --workers 8
+'''
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from analyze_hand import (DEFAULT_TABLE_PATH, TABLE_HEADER, TABLE_MAGIC, TABLE_SLOT, TABLE_VERSION, WINS_TABLE,
+                          _ALL_WINS, _CARD_BITS, _enumerate_codes, _fold, _win_counts, canonical_cards, pack_key,
+                          table_slot)
+
+# Cards held by the player
+HAND_SIZE = 2
+
+
+def canonical_states(table_count):
+    '''Yields the canonical_key of every canonical state with table_count table cards.'''
+    for cards in itertools.combinations(range(52), table_count + HAND_SIZE):
+        # A combination is canonical when no suit relabelling gives a smaller one
+        if canonical_cards(cards) == cards:
+            yield table_count, cards
+
+
+def state_counts(key):
+    '''Returns (key, count per category in _ALL_WINS order, number of combinations) for a state.'''
+    table_count, cards = key
+    remaining = [card for card in range(52) if card not in cards]
+    counts = [0] * len(WINS_TABLE)
+    order = []
+    try:
+        from analyze_hand import _count_codes_numpy
+        counts, order = _count_codes_numpy(list(cards), remaining, 5 - table_count)
+    except ImportError:
+        _enumerate_codes(_fold(cards), [_CARD_BITS[card] for card in remaining], 0, 5 - table_count, counts, order)
+    outcomes = _win_counts(counts, order)
+    return key, [outcomes.get(win, 0) for win in _ALL_WINS], sum(counts)
+
+
+def write_table(path, entries):
+    '''Writes (key, counts, total) entries in the format read by analyze_hand.ProbabilityTable.'''
+    slot_bits = max(4, (2 * len(entries) - 1).bit_length())  # load factor at most 1/2
+    slots = [(0, 0)] * (1 << slot_bits)
+    for row, (key, _, _) in enumerate(entries):
+        packed = pack_key(key)
+        slot = table_slot(packed, slot_bits)
+        while slots[slot][0]:
+            slot = (slot + 1) & (len(slots) - 1)
+        slots[slot] = (packed, row)
+
+    names = json.dumps(list(_ALL_WINS)).encode('utf-8')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(TABLE_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, len(_ALL_WINS), len(entries), len(slots), len(names)))
+        f.write(names.ljust((len(names) + 7) // 8 * 8, b' '))
+        for packed, row in slots:
+            f.write(TABLE_SLOT.pack(packed, row))
+        for _, counts, total in entries:
+            f.write(b''.join(count.to_bytes(4, 'little') for count in counts + [total]))
+    os.replace(temp_path, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the analyze_hand probability table')
+    parser.add_argument('--output', default=DEFAULT_TABLE_PATH, help='Table file to write')
+    parser.add_argument('--flop', action='store_true', help='Also include every canonical flop state (slow)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    args = parser.parse_args()
+
+    table_counts = [0, 3] if args.flop else [0]
+    entries = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for table_count in table_counts:
+            states = list(canonical_states(table_count))
+            print(f"{len(states)} canonical states with {table_count} table cards")
+            for done, entry in enumerate(pool.map(state_counts, states, chunksize=16), 1):
+                entries.append(entry)
+                if done % 1000 == 0:
+                    print(f"  {done}/{len(states)} ({time.perf_counter() - start:.0f} s)")
+
+    write_table(args.output, entries)
+    print(f"Wrote {len(entries)} states to {args.output} in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,126 @@
+'''Card encoding shared by the detector, the card reader server, the analyzer and the sort game.
+
+Every card is an int in 0-51: rank_index * 4 + suit_index, with ranks 2..A as
+indexes 0-12 and suits C, D, H, S as 0-3 ('2C' = 0, '2D' = 1, ..., 'AS' = 51).
+All formats in use are precomputed for the 52 cards, so converting a card is a
+table lookup, and the formats cannot drift apart:
+
+    name         '10D'              detector class names, display strings
+    code         'TD'               analyze_hand notation, one character per rank
+    tuple        (10, 'D')          the card reader's JSON hands, rank 2-14
+    description  '10 of Diamonds'   decode_cards
+
+A hand (one card or empty per slot, as read by the card reader) is a Hand,
+backed by a byte array of card ints.
+'''
+from array import array
+
+RANKS = '23456789TJQKA'
+SUITS = 'CDHS'
+
+RANK_LABELS = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A')
+RANK_NAMES = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'Jack', 'Queen', 'King', 'Ace')
+SUIT_NAMES = ('Clubs', 'Diamonds', 'Hearts', 'Spades')
+
+# Lowest rank value in tuples (2 = rank index 0); aces are 14
+MIN_RANK = 2
+
+DECK = tuple(range(len(RANKS) * len(SUITS)))
+
+# Empty slot in a Hand's array
+EMPTY = -1
+
+# Card -> each format
+CARD_NAMES = tuple(RANK_LABELS[card >> 2] + SUITS[card & 3] for card in DECK)
+CARD_CODES = tuple(RANKS[card >> 2] + SUITS[card & 3] for card in DECK)
+CARD_TUPLES = tuple(((card >> 2) + MIN_RANK, SUITS[card & 3]) for card in DECK)
+CARD_DESCRIPTIONS = tuple(f"{RANK_NAMES[card >> 2]} of {SUIT_NAMES[card & 3]}" for card in DECK)
+
+# Card string in either notation ('10D' or 'TD') -> card
+CARD_INDEX = {**{name: card for card, name in enumerate(CARD_NAMES)},
+              **{code: card for card, code in enumerate(CARD_CODES)}}
+
+# (rank, suit) tuple -> card
+TUPLE_INDEX = {card_tuple: card for card, card_tuple in enumerate(CARD_TUPLES)}
+
+
+def parse_card(value):
+    '''Returns the card of a card int, string in either notation or (rank, suit) tuple or list.
+
+    Raises ValueError for anything that is not one of the 52 cards.
+    '''
+    if isinstance(value, str):
+        card = CARD_INDEX.get(value)
+    elif isinstance(value, int):
+        card = value if 0 <= value < len(DECK) else None
+    else:
+        card = TUPLE_INDEX.get(tuple(value))
+    if card is None:
+        raise ValueError(f"Unknown card {value!r}")
+    return card
+
+
+def decode_cards(cards):
+    '''
+    Decodes the detected cards into a human-readable format.
+
+    Args:
+        cards (list): List of detected cards in the dataset format. e.g. 3C = "3 of Clubs".
+
+    Returns:
+        list: Human-readable descriptions of the detected cards.
+    '''
+    return [CARD_DESCRIPTIONS[CARD_INDEX[card]] for card in cards]
+
+
+def rank_label(rank):
+    '''Returns the display string of a rank value 2-14 ('10', 'J', ..., 'A').'''
+    return RANK_LABELS[rank - MIN_RANK]
+
+
+
+class Hand:
+    '''Cards of a hand's slots in a compact array, EMPTY for empty slots.
+
+    Built from any list of card values (see parse_card) with None for empty
+    slots, e.g. the card reader's per-zone cards or the JSON hands it serves;
+    every format is one lookup per card. Iterating or indexing gives each
+    slot's card int, or None for an empty slot.
+    '''
+
+    __slots__ = ('cards',)
+
+    def __init__(self, values=()):
+        self.cards = array('b', (EMPTY if value is None else parse_card(value) for value in values))
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        return (None if card == EMPTY else card for card in self.cards)
+
+    def __getitem__(self, slot):
+        card = self.cards[slot]
+        return None if card == EMPTY else card
+
+    def __eq__(self, other):
+        return isinstance(other, Hand) and self.cards == other.cards
+
+    def __repr__(self):
+        return f"Hand({self.names()})"
+
+    def present(self):
+        '''Returns the cards of the non-empty slots.'''
+        return [card for card in self.cards if card != EMPTY]
+
+    def names(self):
+        '''Returns each slot's detector name ('10D'), or None.'''
+        return [None if card == EMPTY else CARD_NAMES[card] for card in self.cards]
+
+    def codes(self):
+        '''Returns each slot's analyze_hand code ('TD'), or None.'''
+        return [None if card == EMPTY else CARD_CODES[card] for card in self.cards]
+
+    def tuples(self):
+        '''Returns each slot's (rank, suit) tuple, or None, as in the card reader's JSON hands.'''
+        return [None if card == EMPTY else CARD_TUPLES[card] for card in self.cards]
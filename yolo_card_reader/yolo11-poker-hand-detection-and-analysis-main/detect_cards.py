@@ -1,31 +1,431 @@
+import os
+import sys
+import time
+from threading import Lock
+
+import numpy as np
 from ultralytics import YOLO
 
-def detect_cards(image_path, weights_path, conf=0.5):
+from cards import CARD_INDEX, decode_cards  # decode_cards is part of this module's interface
+
+# Process-wide model registry, keyed by (absolute weights path, task).
+# Models are loaded once and shared by every caller in the process.
+_models = {}
+_registry_lock = Lock()
+
+# Per-model state, keyed by id(model): a predict lock (YOLO predictors are not
+# safe to call concurrently) and load/latency statistics.
+_predict_locks = {}
+_model_stats = {}
+
+
+def get_model(weights_path, task='detect', warmup=True):
     '''
-    Detects cards in an image using YOLO11 model and returns the unique cards.
+    Returns the shared YOLO model for the given weights, loading it on first use.
 
     Args:
-        image_path (str): Path to the image file.
         weights_path (str): Path to the YOLO11 weights file.
+        task (str): YOLO task of the weights. Default is 'detect'.
+        warmup (bool): Run a warm-up inference right after loading. Default is True.
+
+    Returns:
+        YOLO: The loaded model, usable as a handle for detect_cards.
+    '''
+    key = (os.path.abspath(weights_path), task)
+    with _registry_lock:
+        model = _models.get(key)
+        if model is None:
+            start = time.perf_counter()
+            model = YOLO(weights_path, task=task)
+            _register(model, weights_path, task, time.perf_counter() - start)
+            if warmup:
+                warmup_model(model)
+            _models[key] = model
+    return model
+
+
+def _register(model, weights_path=None, task=None, load_time=None):
+    _predict_locks[id(model)] = Lock()
+    _model_stats[id(model)] = {
+        'weights_path': weights_path,
+        'task': task,
+        'load_time': load_time,
+        'warmup_time': None,
+        'inferences': 0,
+        'inference_time': 0.0,
+    }
+
+
+def _resolve_model(weights_path):
+    '''Returns a model for either a weights path or an already loaded model.'''
+    if isinstance(weights_path, (str, os.PathLike)):
+        return get_model(os.fspath(weights_path))
+    return weights_path
+
+
+def warmup_model(model, imgsz=640):
+    '''
+    Runs a dummy inference so the first real frame does not pay for lazy setup.
+
+    Args:
+        model (YOLO): Model returned by get_model.
+        imgsz (int): Side of the square dummy image. Default is 640.
+
+    Returns:
+        float: Warm-up time in seconds.
+    '''
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    predict(model, dummy, verbose=False, count=False)
+    warmup_time = time.perf_counter() - start
+    _model_stats[id(model)]['warmup_time'] = warmup_time
+    return warmup_time
+
+
+def predict(model, source, count=True, **kwargs):
+    '''
+    Thread-safe wrapper around model.predict that records inference latency.
+
+    Args:
+        model (YOLO): Model returned by get_model.
+        source: Anything accepted by YOLO.predict.
+        count (bool): Include this call in the latency statistics. Default is True.
+
+    Returns:
+        list: The YOLO results.
+    '''
+    if id(model) not in _predict_locks:
+        with _registry_lock:
+            if id(model) not in _predict_locks:
+                _register(model)
+
+    with _predict_locks[id(model)]:
+        start = time.perf_counter()
+        results = model.predict(source, **kwargs)
+        elapsed = time.perf_counter() - start
+        if count:
+            stats = _model_stats[id(model)]
+            stats['inferences'] += 1
+            stats['inference_time'] += elapsed
+    return results
+
+
+def model_stats():
+    '''
+    Reports load time, warm-up time and steady-state latency of the loaded models.
+
+    Returns:
+        list: One dict per model with timings in milliseconds.
+    '''
+    report = []
+    for stats in list(_model_stats.values()):
+        inferences = stats['inferences']
+        report.append({
+            'weights_path': stats['weights_path'],
+            'task': stats['task'],
+            'load_ms': _ms(stats['load_time']),
+            'warmup_ms': _ms(stats['warmup_time']),
+            'inferences': inferences,
+            'mean_inference_ms': _ms(stats['inference_time'] / inferences) if inferences else None,
+        })
+    return report
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+# Inference backends: the PyTorch weights, or CPU-optimized exports of them
+BACKENDS = ('torch', 'onnx', 'openvino')
+
+# Most dataset images the ONNX INT8 quantization is calibrated on
+CALIBRATION_IMAGES = 100
+
+
+def exported_weights_path(weights_path, backend='torch', int8=False):
+    '''
+    Returns where the export of the weights for a backend is cached (next to the .pt file).
+
+    Args:
+        weights_path (str): Path to the PyTorch .pt weights.
+        backend (str): One of BACKENDS.
+        int8 (bool): INT8-quantized variant. Default is False.
+
+    Returns:
+        str: Path of the .onnx file or OpenVINO model directory (the .pt path itself for torch).
+    '''
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    base = os.path.splitext(weights_path)[0]
+    if backend == 'onnx':
+        return f"{base}_int8.onnx" if int8 else f"{base}.onnx"
+    if backend == 'openvino':
+        return f"{base}_int8_openvino_model" if int8 else f"{base}_openvino_model"
+    if int8:
+        raise ValueError("INT8 is only available for the onnx and openvino backends")
+    return weights_path
+
+
+def export_weights(weights_path, backend='torch', int8=False, imgsz=640, calibration_data=None):
+    '''
+    Converts the weights for a backend once and returns the cached export.
+
+    The export is redone only when the .pt file is newer than the cached one.
+    ONNX models are exported with a dynamic batch size (zones are batched).
+    INT8 models of both backends are statically quantized, with activation
+    ranges calibrated on the card images of calibration_data, which is
+    required: dynamic quantization of this conv-only model gives ConvInteger
+    ops that ONNX Runtime often runs slower than FP32 on CPU, and Ultralytics
+    would calibrate OpenVINO on (and download) COCO.
+
+    Args:
+        weights_path (str): Path to the PyTorch .pt weights.
+        backend (str): One of BACKENDS. Default is 'torch'.
+        int8 (bool): Export the INT8-quantized variant. Default is False.
+        imgsz (int): Model input size. Default is 640.
+        calibration_data (str): Card dataset yaml for INT8 calibration. Default is None.
+
+    Returns:
+        str: Path to load with get_model.
+    '''
+    path = exported_weights_path(weights_path, backend, int8)
+    if backend == 'torch':
+        return path
+    if int8 and not calibration_data:
+        raise ValueError("INT8 export needs calibration_data, a dataset yaml with card images")
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights_path):
+        return path
+
+    start = time.perf_counter()
+    if backend == 'onnx':
+        fp32_path = exported_weights_path(weights_path, 'onnx')
+        if not os.path.exists(fp32_path) or os.path.getmtime(fp32_path) < os.path.getmtime(weights_path):
+            YOLO(weights_path).export(format='onnx', imgsz=imgsz, dynamic=True)
+        if int8:
+            from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+            reader = _calibration_reader(fp32_path, calibration_images(calibration_data), imgsz)
+            quantize_static(fp32_path, path, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    else:
+        options = {'data': calibration_data} if int8 else {}
+        YOLO(weights_path).export(format='openvino', imgsz=imgsz, dynamic=True, int8=int8, **options)
+    print(f"Exported {weights_path} to {path} in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    return path
+
+
+def calibration_images(calibration_data, limit=CALIBRATION_IMAGES):
+    '''
+    Returns card image paths of a dataset yaml to calibrate INT8 quantization on.
+
+    Args:
+        calibration_data (str): Ultralytics dataset yaml; its val images are used (train if it has none).
+        limit (int): Maximum number of images, spread evenly over the dataset. Default is CALIBRATION_IMAGES.
+
+    Returns:
+        list: Image paths.
+    '''
+    from ultralytics.data.utils import IMG_FORMATS, check_det_dataset
+
+    data = check_det_dataset(calibration_data, autodownload=False)
+    sources = data.get('val') or data.get('train')
+    images = []
+    for source in sources if isinstance(sources, list) else [sources]:
+        if os.path.isdir(source):
+            for root, _, names in os.walk(source):
+                images.extend(os.path.join(root, name) for name in names
+                              if name.rsplit('.', 1)[-1].lower() in IMG_FORMATS)
+        elif source.endswith('.txt'):
+            with open(source) as f:
+                images.extend(line.strip() for line in f if line.strip())
+    if not images:
+        raise ValueError(f"No calibration images found in {calibration_data}")
+    images.sort()
+    return images[::max(1, len(images) // limit)][:limit]
+
+
+def _calibration_reader(onnx_path, images, imgsz):
+    '''Returns an ONNX Runtime CalibrationDataReader feeding images preprocessed like YOLO.predict does.'''
+    import cv2
+    import onnxruntime
+    from onnxruntime.quantization import CalibrationDataReader
+    from ultralytics.data.augment import LetterBox
+
+    input_name = onnxruntime.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    letterbox = LetterBox((imgsz, imgsz), auto=False)
+
+    class CardImageReader(CalibrationDataReader):
+        def __init__(self):
+            self._images = iter(images)
+
+        def get_next(self):
+            for path in self._images:
+                image = cv2.imread(path)
+                if image is None:
+                    continue
+                image = letterbox(image=image)[..., ::-1].transpose(2, 0, 1)  # BGR HWC -> RGB CHW
+                return {input_name: np.ascontiguousarray(image[None], dtype=np.float32) / 255}
+            return None
+
+    return CardImageReader()
+
+
+def _latency_ms(model, images, repeat):
+    '''Returns the mean predict latency of a model over images in milliseconds.'''
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for image in images:
+            predict(model, image, verbose=False, count=False)
+    return _ms((time.perf_counter() - start) / max(1, repeat * len(images)))
+
+
+def compare_backends(reference_path, candidate_path, images, conf=0.5, repeat=3, fp32_path=None):
+    '''
+    Checks that a converted model detects the same cards as the reference weights.
+
+    Args:
+        reference_path (str): Reference weights (usually the .pt file).
+        candidate_path (str): Converted weights, e.g. from export_weights.
+        images (list): Image paths to compare on.
+        conf (float): Confidence threshold for the detection. Default is 0.5.
+        repeat (int): Timed runs per image for the latency figures. Default is 3.
+        fp32_path (str): FP32 export of the same backend, timed as well when the candidate
+            is its INT8 variant, since INT8 only pays off if it beats that. Default is None.
+
+    Returns:
+        dict: 'agreement' (share of images with identical cards), 'mismatches'
+            (image, reference cards, candidate cards) and mean latency in ms of both models
+            ('reference_ms', 'candidate_ms', and 'fp32_ms' with fp32_path).
+    '''
+    report = {'images': len(images), 'mismatches': []}
+    cards = {}
+    for name, path in (('reference', reference_path), ('candidate', candidate_path)):
+        model = get_model(path)
+        cards[name] = [detect_cards(image, model, conf) for image in images]
+        report[f'{name}_ms'] = _latency_ms(model, images, repeat)
+    if fp32_path is not None:
+        report['fp32_ms'] = _latency_ms(get_model(fp32_path), images, repeat)
+
+    for image, expected, actual in zip(images, cards['reference'], cards['candidate']):
+        if sorted(expected) != sorted(actual):
+            report['mismatches'].append((image, expected, actual))
+    report['agreement'] = 1 - len(report['mismatches']) / len(images) if images else 1.0
+    return report
+
+
+def detect_cards(image, weights_path, conf=0.5):
+    '''
+    Detects cards in an image using YOLO11 model and returns the unique cards.
+
+    Args:
+        image (str or numpy.ndarray): Path to the image file, or a BGR image array.
+            Array views (e.g. a vertical slice of a decoded frame) are passed to the
+            model as-is, without copying or re-encoding.
+        weights_path (str or YOLO): Path to the YOLO11 weights file, or a model returned by get_model.
         conf (float): Confidence threshold for the detection. Default is 0.5.
 
     Returns:
         list: List of unique cards detected in the image with confidence above the threshold sorted by their left position.
     '''
 
-    model = YOLO(weights_path, task='detect')
-    result = model.predict(image_path)[0]
+    model = _resolve_model(weights_path)
+    result = predict(model, image)[0]
+    return cards_from_boxes(_boxes_from_result(result, conf))
+
+
+def detect_cards_batch(images, weights_path, conf=0.5, batch_size=8):
+    '''
+    Detects cards in several images, sending them through the model in batches.
+
+    Args:
+        images (list): Image paths or BGR image arrays (e.g. the zones of a frame).
+        weights_path (str or YOLO): Path to the YOLO11 weights file, or a model returned by get_model.
+        conf (float): Confidence threshold for the detection. Default is 0.5.
+        batch_size (int): Maximum number of images per predict call. Default is 8.
+
+    Returns:
+        list: One list of cards per input image, in the same format as detect_cards.
+    '''
+    return [cards_from_boxes(boxes)
+            for boxes in detect_card_boxes_batch(images, weights_path, conf, batch_size)]
+
+
+def detect_card_boxes_batch(images, weights_path, conf=0.5, batch_size=8):
+    '''
+    Detects cards in several images in batches and returns every box above the threshold.
+
+    Args:
+        images (list): Image paths or BGR image arrays (e.g. the zones of a frame).
+        weights_path (str or YOLO): Path to the YOLO11 weights file, or a model returned by get_model.
+        conf (float): Confidence threshold for the detection. Default is 0.5.
+        batch_size (int): Maximum number of images per predict call. Default is 8.
+
+    Returns:
+        list: One list of boxes per input image, in the same format as detect_card_boxes.
+    '''
+    model = _resolve_model(weights_path)
+    batch_size = max(1, int(batch_size))
+    boxes = []
+    for start in range(0, len(images), batch_size):
+        results = predict(model, list(images[start:start + batch_size]), verbose=False)
+        boxes.extend(_boxes_from_result(result, conf) for result in results)
+    return boxes
+
+
+def detect_card_boxes(image, weights_path, conf=0.5):
+    '''
+    Detects cards in an image and returns every box above the threshold.
+
+    Args:
+        image (str or numpy.ndarray): Path to the image file, or a BGR image array.
+        weights_path (str or YOLO): Path to the YOLO11 weights file, or a model returned by get_model.
+        conf (float): Confidence threshold for the detection. Default is 0.5.
+
+    Returns:
+        list: Dicts with 'name', 'card' (its 0-51 encoding, see cards.py, or None for
+            an unknown class name), 'confidence' and the 'x1', 'y1', 'x2', 'y2' box corners in pixels.
+    '''
+    model = _resolve_model(weights_path)
+    result = predict(model, image, verbose=False)[0]
+    return _boxes_from_result(result, conf)
+
+
+def _boxes_from_result(result, conf):
+    '''Returns the boxes of a YOLO result with confidence above the threshold.'''
+    boxes = []
+    for card in result.summary():
+        if card['confidence'] >= conf:
+            box = card['box']
+            boxes.append({
+                'name': card['name'],
+                'card': CARD_INDEX.get(card['name']),
+                'confidence': card['confidence'],
+                'x1': box['x1'],
+                'y1': box['y1'],
+                'x2': box['x2'],
+                'y2': box['y2'],
+            })
+    return boxes
+
+
+def cards_from_boxes(boxes):
+    '''
+    Returns the unique card names of detected boxes sorted by their left position.
+
+    Args:
+        boxes (list): Boxes as returned by detect_card_boxes.
+
+    Returns:
+        list: Card names, in the same format as detect_cards.
+    '''
     cards = [] # a list of tuples (left, card_name)
     cards_names = [] # a list of card names for deduplication
-    summary = result.summary()
 
-    for card in summary:
-        if card['confidence'] >= conf:
-            card_name = card['name']
-            if card_name not in cards_names:
-                cards_names.append(card_name)
-                card_left = min(card['box']['x1'], card['box']['x2'])
-                cards.append((card_left, card_name))
+    for box in boxes:
+        card_name = box['name']
+        if card_name not in cards_names:
+            cards_names.append(card_name)
+            card_left = min(box['x1'], box['x2'])
+            cards.append((card_left, card_name))
         
     # Sort the cards by their left position
     cards.sort(key=lambda x: x[0])
@@ -36,109 +436,21 @@ def detect_cards(image_path, weights_path, conf=0.5):
     return card_names 
 
 
-def decode_cards(cards):
-    '''
-    Decodes the detected cards into a human-readable format.
-
-    Args:
-        cards (list): List of detected cards in the dataset format. e.g. 3C = "3 of Clubs".
-    
-    Returns:
-        str: Human-readable format of the detected cards.
-    '''
-    
-    card_names = {
-        '2C': '2 of Clubs',
-        '3C': '3 of Clubs',
-        '4C': '4 of Clubs',
-        '5C': '5 of Clubs',
-        '6C': '6 of Clubs',
-        '7C': '7 of Clubs',
-        '8C': '8 of Clubs',
-        '9C': '9 of Clubs',
-        '10C': '10 of Clubs',
-        'JC': 'Jack of Clubs',
-        'QC': 'Queen of Clubs',
-        'KC': 'King of Clubs',
-        '2D': '2 of Diamonds',
-        '3D': '3 of Diamonds',
-        '4D': '4 of Diamonds',
-        '5D': '5 of Diamonds',
-        '6D': '6 of Diamonds',
-        '7D': '7 of Diamonds',
-        '8D': '8 of Diamonds',
-        '9D': '9 of Diamonds',
-        '10D': '10 of Diamonds',
-        'JD': 'Jack of Diamonds',
-        'QD': 'Queen of Diamonds',
-        'KD': 'King of Diamonds',
-        '2H': '2 of Hearts',
-        '3H': '3 of Hearts',
-        '4H': '4 of Hearts',
-        '5H': '5 of Hearts',
-        '6H': '6 of Hearts',
-        '7H': '7 of Hearts',
-        '8H': '8 of Hearts',
-        '9H': '9 of Hearts',
-        '10H': '10 of Hearts',
-        'JH': 'Jack of Hearts',
-        'QH': 'Queen of Hearts',
-        'KH': 'King of Hearts',
-        '2S': '2 of Spades',
-        '3S': '3 of Spades',
-        '4S': '4 of Spades',
-        '5S': '5 of Spades',
-        '6S': '6 of Spades',
-        '7S': '7 of Spades',
-        '8S': '8 of Spades',
-        '9S': '9 of Spades',
-        '10S': '10 of Spades',
-        'JS': 'Jack of Spades',
-        'QS': 'Queen of Spades',
-        'KS': 'King of Spades',
-        '2H': '2 of Hearts',
-        '3H': '3 of Hearts',
-        '4H': '4 of Hearts',
-        '5H': '5 of Hearts',
-        '6H': '6 of Hearts',
-        '7H': '7 of Hearts',
-        '8H': '8 of Hearts',
-        '9H': '9 of Hearts',
-        '10H': '10 of Hearts',
-        'JH': 'Jack of Hearts',
-        'QH': 'Queen of Hearts',
-        'KH': 'King of Hearts',
-        '2S': '2 of Spades',
-        '3S': '3 of Spades',
-        '4S': '4 of Spades',
-        '5S': '5 of Spades',
-        '6S': '6 of Spades',
-        '7S': '7 of Spades',
-        '8S': '8 of Spades',
-        '9S': '9 of Spades',
-        '10S': '10 of Spades',
-        'JS': 'Jack of Spades',
-        'QS': 'Queen of Spades',
-        'KS': 'King of Spades',
-    }
-    
-    return [card_names[card] for card in cards]
-
 if __name__ == '__main__':
+    # Load the model once and reuse it for every image
+    model = get_model('weights/poker_best.pt')
+
     # Test on the first image
     image_path = 'images/test_img_1.png'
-    weights_path = 'weights/poker_best.pt'
-    cards = detect_cards(image_path, weights_path)
+    cards = detect_cards(image_path, model)
     print("\n".join(decode_cards(cards)))
 
     # Test on the second image
     image_path = 'images/test_img_2.png'
-    weights_path = 'weights/poker_best.pt'
-    cards = detect_cards(image_path, weights_path)
+    cards = detect_cards(image_path, model)
     print("\n".join(decode_cards(cards)))
 
     # Test on the third image
     image_path = 'images/test_img_3.png'
-    weights_path = 'weights/poker_best.pt'
-    cards = detect_cards(image_path, weights_path)
+    cards = detect_cards(image_path, model)
     print("\n".join(decode_cards(cards)))
\ No newline at end of file
@@ -0,0 +1,52 @@
+'''Exports the poker weights for a CPU inference backend and checks its accuracy.
+
+The export is cached next to the .pt weights (see detect_cards.export_weights)
+and compared with the PyTorch model on the bundled test images.
+
+Usage:
+    python export_model.py --backend onnx
+    python export_model.py --backend onnx --int8 --data cards.yaml
+    python export_model.py --backend openvino --int8 --data cards.yaml
+'''
+import argparse
+import glob
+import sys
+
+from detect_cards import BACKENDS, compare_backends, export_weights
+
+WEIGHTS_PATH = 'weights/poker_best.pt'
+TEST_IMAGES = 'images/test_img_*.png'
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the YOLO weights for a CPU inference backend')
+    parser.add_argument('--backend', choices=BACKENDS[1:], default='onnx', help='Inference backend')
+    parser.add_argument('--int8', action='store_true', help='Export the INT8-quantized variant')
+    parser.add_argument('--weights', default=WEIGHTS_PATH, help='PyTorch weights to export')
+    parser.add_argument('--imgsz', type=int, default=640, help='Model input size')
+    parser.add_argument('--data', help='Card dataset yaml for INT8 calibration (required with --int8)')
+    parser.add_argument('--conf', type=float, default=0.5, help='Confidence threshold for the accuracy check')
+    parser.add_argument('--min-agreement', type=float, default=1.0,
+                        help='Share of test images that must give the same cards as the PyTorch model')
+    args = parser.parse_args()
+
+    path = export_weights(args.weights, args.backend, args.int8, args.imgsz, args.data)
+
+    # Results test_img_*_result.png are renders, not inputs
+    images = sorted(image for image in glob.glob(TEST_IMAGES) if not image.endswith('_result.png'))
+    # INT8 is compared with the FP32 export of the same backend too
+    fp32_path = export_weights(args.weights, args.backend, False, args.imgsz) if args.int8 else None
+    report = compare_backends(args.weights, path, images, args.conf, fp32_path=fp32_path)
+    print(f"{path}: {report['agreement']:.0%} of {report['images']} test images agree with {args.weights}")
+    if args.int8:
+        print(f"Latency: {report['reference_ms']} ms (torch) -> {report['fp32_ms']} ms ({args.backend}) "
+              f"-> {report['candidate_ms']} ms ({args.backend} int8)")
+        if report['candidate_ms'] >= report['fp32_ms']:
+            print(f"INT8 is not faster than FP32 {args.backend} on this machine, keep \"int8\": false")
+    else:
+        print(f"Latency: {report['reference_ms']} ms (torch) -> {report['candidate_ms']} ms ({args.backend})")
+    for image, expected, actual in report['mismatches']:
+        print(f"  {image}: expected {expected}, got {actual}")
+
+    if report['agreement'] < args.min_agreement:
+        print(f"Accuracy check failed (minimum {args.min_agreement:.0%})")
+        sys.exit(1)
@@ -0,0 +1,94 @@
+'''Checks the integer evaluator and the enumeration engines of analyze_hand against the original string code.
+
+Run with: python -m pytest test_analyze_hand.py
+'''
+import itertools
+import random
+from collections import Counter
+
+import pytest
+
+import analyze_hand
+
+RANKS = '23456789TJQKA'
+SEED = 1234
+
+
+def reference_evaluate_hand(cards):
+    '''The original Counter-based evaluate_hand, on 'KS'-style card strings.'''
+    ranks = sorted([card[0] for card in cards], key=RANKS.index)
+    suits = [card[1] for card in cards]
+    rank_counts = Counter(ranks)
+    sorted_rank_freqs = sorted(rank_counts.values(), reverse=True)
+    suit_counts = Counter(suits)
+
+    is_flush = max(suit_counts.values()) >= 5
+    is_straight = any(set(RANKS[i:i+5]).issubset(ranks) for i in range(len(RANKS) - 4))
+
+    wins = []
+    if is_straight and is_flush:
+        wins.append("Straight Flush")
+    if is_flush:
+        wins.append("Flush")
+    if is_straight:
+        wins.append("Straight")
+    if max(rank_counts.values()) >= 2:
+        wins.append("One Pair")
+    if (sorted_rank_freqs[0] >= 2 and sorted_rank_freqs[1] >= 2) or sorted_rank_freqs[0] >= 4:
+        wins.append("Two Pair")
+    if max(rank_counts.values()) >= 3:
+        wins.append("Three of a Kind")
+    if max(rank_counts.values()) >= 4:
+        wins.append("Four of a Kind")
+    if sorted_rank_freqs[0] >= 3 and sorted_rank_freqs[1] >= 2:
+        wins.append("Full House")
+    return wins
+
+
+def reference_analyze_hand(table_cards, hand_cards):
+    '''The original exhaustive analyze_hand, built on reference_evaluate_hand.'''
+    known_cards = set(table_cards + hand_cards)
+    remaining_deck = [card for card in analyze_hand.generate_deck() if card not in known_cards]
+    outcomes = Counter()
+    total_cases = 0
+    for extra_cards in itertools.combinations(remaining_deck, 5 - len(table_cards)):
+        for win in reference_evaluate_hand(table_cards + hand_cards + list(extra_cards)):
+            outcomes[win] += 1
+        total_cases += 1
+    probabilities = {rank: count / total_cases for rank, count in outcomes.items()}
+    return dict(sorted(probabilities.items(), key=lambda item: item[1], reverse=True))
+
+
+def seeded_states(table_count, count, seed):
+    rng = random.Random(seed)
+    deck = analyze_hand.generate_deck()
+    states = []
+    for _ in range(count):
+        cards = rng.sample(deck, table_count + 2)
+        states.append((cards[:table_count], cards[table_count:]))
+    return states
+
+
+STATES = seeded_states(3, 2, SEED) + seeded_states(4, 3, SEED + 1) + seeded_states(5, 5, SEED + 2)
+
+
+def test_evaluate_hand_int_matches_string_evaluator():
+    rng = random.Random(SEED)
+    deck = analyze_hand.generate_deck()
+    for _ in range(5000):
+        cards = rng.sample(deck, 7)
+        assert analyze_hand.evaluate_hand_int(analyze_hand.encode_cards(cards)) == reference_evaluate_hand(cards)
+
+
+@pytest.mark.parametrize('table_cards, hand_cards', STATES)
+def test_python_method_matches_original(table_cards, hand_cards):
+    result = analyze_hand.analyze_hand(table_cards, hand_cards, cache=False, table=False)
+    assert result == reference_analyze_hand(table_cards, hand_cards)
+
+
+@pytest.mark.parametrize('method', ['numpy', 'parallel'])
+@pytest.mark.parametrize('table_cards, hand_cards', STATES)
+def test_methods_match_serial_path(method, table_cards, hand_cards):
+    serial = analyze_hand.analyze_hand(table_cards, hand_cards, cache=False, table=False)
+    result = analyze_hand.analyze_hand(table_cards, hand_cards, method=method, workers=2, cache=False, table=False)
+    assert list(result.items()) == list(serial.items())
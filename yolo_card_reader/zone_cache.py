@@ -0,0 +1,102 @@
+from threading import Lock
+
+import cv2
+
+# Side of the grayscale thumbnail each zone is reduced to for comparison
+THUMB_SIZE = 16
+
+
+class ZoneChangeDetector:
+    """Per-zone dirty check that lets unchanged zones reuse their last result
+
+    Each zone is reduced to a small grayscale thumbnail and compared with the
+    thumbnail of the crop that was last sent through the model. A zone whose
+    mean absolute difference stays below the threshold is clean and reuses the
+    cached result of that crop.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._settings = None
+        self._thumbs = {}   # zone -> thumbnail of the last processed crop
+        self._results = {}  # zone -> result of the last processed crop
+        self._hits = {}
+        self._misses = {}
+
+    def reset(self):
+        """Forget all cached crops, results and counters"""
+        with self._lock:
+            self._settings = None
+            self._thumbs.clear()
+            self._results.clear()
+            self._hits.clear()
+            self._misses.clear()
+
+    @staticmethod
+    def thumbnail(zone):
+        """Reduce a BGR zone crop to a THUMB_SIZE x THUMB_SIZE grayscale image"""
+        small = cv2.resize(zone, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def check(self, zones, threshold, settings=None):
+        """Compare zone crops with the last processed ones
+
+        Args:
+            zones: Zone crops (BGR arrays), in zone order.
+            threshold: Mean absolute thumbnail difference (0-255) above which
+                a zone counts as changed. 0 disables the cache.
+            settings: Anything that affects detection results (zone count,
+                confidence, mode...). Cached results are dropped when it changes.
+
+        Returns:
+            (dirty, thumbs): a changed flag and the thumbnail for every zone.
+        """
+        thumbs = [self.thumbnail(zone) for zone in zones]
+
+        with self._lock:
+            if settings != self._settings:
+                self._settings = settings
+                self._thumbs.clear()
+                self._results.clear()
+
+            dirty = []
+            for i, thumb in enumerate(thumbs):
+                previous = self._thumbs.get(i)
+                dirty.append(threshold <= 0 or previous is None
+                             or cv2.absdiff(previous, thumb).mean() > threshold)
+
+        return dirty, thumbs
+
+    def difference(self, zone, thumb):
+        """Mean absolute difference between a thumbnail and the zone's last processed one, None if there is none"""
+        with self._lock:
+            previous = self._thumbs.get(zone)
+        return None if previous is None else float(cv2.absdiff(previous, thumb).mean())
+
+    def store(self, zone, thumb, result):
+        """Record that a zone went through the model (a cache miss)
+
+        The crop and its result are cached unless result is None (failed
+        inference), in which case the zone is retried on the next frame.
+        """
+        with self._lock:
+            self._misses[zone] = self._misses.get(zone, 0) + 1
+            if result is None:
+                self._thumbs.pop(zone, None)
+                self._results.pop(zone, None)
+            else:
+                self._thumbs[zone] = thumb
+                self._results[zone] = result
+
+    def cached_result(self, zone):
+        """Return the cached result of a clean zone (a cache hit)"""
+        with self._lock:
+            self._hits[zone] = self._hits.get(zone, 0) + 1
+            return self._results[zone]
+
+    def stats(self):
+        """Return cache hit and miss counts per zone"""
+        with self._lock:
+            zones = sorted(set(self._hits) | set(self._misses))
+            return [{'zone': i, 'hits': self._hits.get(i, 0), 'misses': self._misses.get(i, 0)}
+                    for i in zones]
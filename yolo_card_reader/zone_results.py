@@ -0,0 +1,37 @@
+# Zone results are built from the detector's boxes with the shared card tables only,
+# so they can be used (and benchmarked) without the model
+from cards import CARD_NAMES, CARD_TUPLES
+
+
+def zone_cards(boxes):
+    """Unique cards (0-51, see cards.py) of a zone's boxes, sorted by their left position"""
+    lefts = {}
+    for box in boxes:
+        card = box['card']
+        if card is not None and card not in lefts:  # None: class name that is not a card
+            lefts[card] = min(box['x1'], box['x2'])
+    return sorted(lefts, key=lefts.get)
+
+
+def zone_result(zone_index, x_start, x_end, boxes):
+    """Build the result entry for one zone from its detected boxes"""
+    card_ids = zone_cards(boxes)
+    return {
+        'zone': zone_index,
+        'x_start': x_start,
+        'x_end': x_end,
+        'card_ids': card_ids,  # Cards as 0-51 ints, e.g. [50, 0]
+        'cards': [CARD_TUPLES[card] for card in card_ids],  # List of tuples like [(14, 'H'), (2, 'S')]
+        'cards_str': [CARD_NAMES[card] for card in card_ids],  # Detector strings like ['AH', '2S']
+        'has_card': len(card_ids) > 0,
+        'cached': False,  # Reused from the zone cache
+        'tracked': False  # Carried forward by the tracker
+    }
+
+
+def card_box(boxes, result):
+    """Return the box of the zone's hand card (the most confident one), or None"""
+    if not result['card_ids']:
+        return None
+    card = result['card_ids'][0]
+    return max((box for box in boxes if box['card'] == card), key=lambda box: box['confidence'])